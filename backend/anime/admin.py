@@ -1,6 +1,6 @@
 
 from django.contrib import admin
-from .models import Anime, Genre, Rating, Comment
+from .models import Anime, Genre, Rating, Comment, CommentReport
 
 class AnimeAdmin(admin.ModelAdmin):
     list_display = ('title', 'type', 'year', 'rating')
@@ -25,7 +25,12 @@ class CommentAdmin(admin.ModelAdmin):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Comment'
 
+class CommentReportAdmin(admin.ModelAdmin):
+    list_display = ('comment', 'user', 'reason', 'created_at', 'resolved_at')
+    list_filter = ('resolved_at',)
+
 admin.site.register(Anime, AnimeAdmin)
 admin.site.register(Genre, GenreAdmin)
 admin.site.register(Rating, RatingAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(CommentReport, CommentReportAdmin)
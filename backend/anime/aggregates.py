@@ -0,0 +1,74 @@
+"""
+Denormalized rating aggregates on Anime.
+
+`rating_sum`, `rating_count` and the per-score histogram (`score_count_1` to
+`score_count_10`) are adjusted with F() expressions in a single UPDATE per
+rating write, and `rating` (the rounded average) and `weighted_score` (see
+anime.ranking) are derived in the same statement, so rating a popular title
+costs the same as an obscure one.
+"""
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+from .models import Anime, Rating
+from .ranking import SCORES, histogram_field, weighted_score_expression
+
+
+def apply_rating_change(anime_id, old_score, new_score):
+    """
+    Apply one rating create (`old_score` is None), update or delete
+    (`new_score` is None) to the anime's counters.
+    """
+    score_delta = (new_score or 0) - (old_score or 0)
+    count_delta = (new_score is not None) - (old_score is not None)
+    if not score_delta and not count_delta:
+        return
+    histogram = {}
+    if old_score is not None:
+        histogram[histogram_field(old_score)] = F(histogram_field(old_score)) - 1
+    if new_score is not None:
+        histogram[histogram_field(new_score)] = F(histogram_field(new_score)) + 1
+
+    # Every expression in an UPDATE sees the row as it was before the
+    # statement, so the average is computed from the adjusted totals here.
+    # A queryset update also keeps Anime's save signals out of rating writes.
+    Anime.objects.filter(pk=anime_id).update(
+        rating_sum=F('rating_sum') + score_delta,
+        rating_count=F('rating_count') + count_delta,
+        rating=Case(
+            When(
+                rating_count__gt=-count_delta,
+                then=Round(
+                    Cast(F('rating_sum') + score_delta, FloatField()) / (F('rating_count') + count_delta),
+                    1
+                ),
+            ),
+            # Keep the catalogue rating once the last user rating is gone
+            default=F('rating'),
+        ),
+        weighted_score=weighted_score_expression(score_delta, count_delta),
+        **histogram,
+    )
+
+
+def recompute_rating_aggregates(queryset=None):
+    """
+    Rebuild the counters from the Rating table with set-based updates;
+    follow with ranking.recompute_weighted_scores
+    """
+    if queryset is None:
+        queryset = Anime.objects.all()
+    per_anime = Rating.objects.filter(anime=OuterRef('pk')).values('anime')
+    queryset.update(
+        rating_sum=Coalesce(Subquery(per_anime.annotate(total=Sum('score')).values('total')), 0),
+        rating_count=Coalesce(Subquery(per_anime.annotate(total=Count('id')).values('total')), 0),
+        **{
+            histogram_field(score): Coalesce(
+                Subquery(per_anime.filter(score=score).annotate(total=Count('id')).values('total')), 0
+            )
+            for score in SCORES
+        },
+    )
+    queryset.filter(rating_count__gt=0).update(
+        rating=Round(Cast(F('rating_sum'), FloatField()) / F('rating_count'), 1)
+    )
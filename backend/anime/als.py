@@ -0,0 +1,208 @@
+"""
+Matrix factorisation recommender trained offline with alternating least squares.
+
+Ratings minus their global mean form a sparse users x anime CSR matrix R.
+ALS alternates between solving every user's factor vector with the anime
+factors fixed and the other way round; each half-step is an independent
+ridge regression per row, with the penalty scaled by the row's number of
+ratings (weighted-lambda regularisation).
+
+Trained factors are written as .npy files and memory-mapped when served, so
+every worker process shares one copy through the page cache. A request folds
+the user's current ratings into a factor vector (one small solve against the
+anime factors), scores every anime with a single matrix-vector product and
+takes the top k with argpartition. Ratings written after training are
+therefore reflected without retraining.
+"""
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from .models import Rating
+from .recommender import SCALE_MIDPOINT, get_config
+
+FILES = ('user_ids', 'anime_ids', 'user_factors', 'item_factors')
+META = 'meta.json'
+
+
+def load_ratings(queryset=None, chunk_size=50000):
+    """(user_ids, anime_ids, scores) arrays, read in bounded chunks"""
+    queryset = (queryset if queryset is not None else Rating.objects.all()).order_by()
+    total = queryset.count()
+    users = np.empty(total, dtype=np.int64)
+    items = np.empty(total, dtype=np.int64)
+    scores = np.empty(total, dtype=np.float64)
+    rows = queryset.values_list('user_id', 'anime_id', 'score').iterator(chunk_size=chunk_size)
+    filled = 0
+    # Rows written after the count are left out
+    while filled < total:
+        chunk = list(itertools.islice(rows, min(chunk_size, total - filled)))
+        if not chunk:
+            break
+        chunk = np.array(chunk, dtype=np.int64)
+        end = filled + len(chunk)
+        users[filled:end], items[filled:end], scores[filled:end] = chunk.T
+        filled = end
+    return users[:filled], items[:filled], scores[:filled]
+
+
+def _solve_rows(matrix, fixed, regularization):
+    """Ridge solution for every row of `matrix` against the `fixed` factors"""
+    factors = fixed.shape[1]
+    identity = np.eye(factors)
+    solved = np.zeros((matrix.shape[0], factors))
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+    for row in range(matrix.shape[0]):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        y = fixed[indices[start:end]]
+        a = y.T @ y + regularization * (end - start) * identity
+        solved[row] = np.linalg.solve(a, y.T @ data[start:end])
+    return solved
+
+
+def _predict_pairs(user_factors, item_factors, rows, columns, chunk_size=1000000):
+    """Dot products for (row, column) index pairs, without a dense n x factors temporary"""
+    predictions = np.empty(len(rows))
+    for start in range(0, len(rows), chunk_size):
+        end = start + chunk_size
+        predictions[start:end] = np.einsum(
+            'ij,ij->i', user_factors[rows[start:end]], item_factors[columns[start:end]]
+        )
+    return predictions
+
+
+class ALSModel:
+    def __init__(self, user_ids, anime_ids, user_factors, item_factors, mean, regularization):
+        # Id arrays are sorted, so ids map to rows with searchsorted
+        self.user_ids = user_ids
+        self.anime_ids = anime_ids
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.mean = mean
+        self.regularization = regularization
+
+    @classmethod
+    def train(cls, users, items, scores, factors=32, regularization=0.1, iterations=15, seed=0, callback=None):
+        user_ids, rows = np.unique(users, return_inverse=True)
+        anime_ids, columns = np.unique(items, return_inverse=True)
+        mean = float(scores.mean()) if len(scores) else SCALE_MIDPOINT
+        matrix = sparse.csr_matrix(
+            (scores - mean, (rows, columns)), shape=(len(user_ids), len(anime_ids)), dtype=np.float64
+        )
+        transposed = matrix.T.tocsr()
+
+        rng = np.random.default_rng(seed)
+        user_factors = rng.normal(0, 0.1, (len(user_ids), factors))
+        item_factors = rng.normal(0, 0.1, (len(anime_ids), factors))
+        model = cls(user_ids, anime_ids, user_factors, item_factors, mean, regularization)
+        for iteration in range(iterations):
+            model.user_factors = _solve_rows(matrix, model.item_factors, regularization)
+            model.item_factors = _solve_rows(transposed, model.user_factors, regularization)
+            if callback is not None:
+                callback(iteration, model.rmse(users, items, scores))
+        return model
+
+    def user_rows(self, users):
+        """Factor rows of the given user ids (-1 when unknown)"""
+        return self._rows(self.user_ids, users)
+
+    def anime_rows(self, items):
+        return self._rows(self.anime_ids, items)
+
+    def _rows(self, ids, wanted):
+        wanted = np.asarray(wanted, dtype=np.int64)
+        if not len(ids):
+            return np.full(len(wanted), -1)
+        positions = np.searchsorted(ids, wanted)
+        positions[positions >= len(ids)] = 0
+        return np.where(ids[positions] == wanted, positions, -1)
+
+    def predict(self, users, items):
+        """Predicted scores for (user, anime) pairs; pairs outside the model get the mean"""
+        rows, columns = self.user_rows(users), self.anime_rows(items)
+        known = (rows >= 0) & (columns >= 0)
+        predictions = np.full(len(rows), self.mean)
+        predictions[known] += _predict_pairs(self.user_factors, self.item_factors, rows[known], columns[known])
+        return np.clip(predictions, 1, 10)
+
+    def rmse(self, users, items, scores):
+        if not len(scores):
+            return 0.0
+        return float(np.sqrt(np.mean((self.predict(users, items) - scores) ** 2)))
+
+    def fold_in(self, user_scores):
+        """Factor vector for a user's current ratings, with the anime factors fixed"""
+        columns = self.anime_rows(list(user_scores))
+        known = columns >= 0
+        if not known.any():
+            return None
+        y = np.asarray(self.item_factors[columns[known]])
+        scores = np.fromiter(user_scores.values(), dtype=np.float64, count=len(user_scores))[known]
+        a = y.T @ y + self.regularization * len(y) * np.eye(y.shape[1])
+        return np.linalg.solve(a, y.T @ (scores - self.mean))
+
+    def recommend(self, user_scores, limit):
+        """
+        (anime_id, predicted deviation from the middle of the scale) for the
+        best anime the user has not rated, like ItemSimilarityEngine.recommend_for_user
+        """
+        vector = self.fold_in(user_scores)
+        if vector is None or not limit:
+            return []
+        scores = self.item_factors @ vector + self.mean
+        rated = self.anime_rows(list(user_scores))
+        scores[rated[rated >= 0]] = -np.inf
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (int(self.anime_ids[index]), float(scores[index] - SCALE_MIDPOINT))
+            for index in top if scores[index] > SCALE_MIDPOINT
+        ]
+
+    def save(self, path, **meta):
+        os.makedirs(path, exist_ok=True)
+        for name in FILES:
+            # Replace atomically: processes still mapping the old file keep it
+            temporary = os.path.join(path, f'.{name}.tmp.npy')
+            np.save(temporary, np.ascontiguousarray(getattr(self, name)))
+            os.replace(temporary, os.path.join(path, f'{name}.npy'))
+        meta = {'mean': self.mean, 'regularization': self.regularization, 'trained_at': time.time(), **meta}
+        temporary = os.path.join(path, f'.{META}.tmp')
+        with open(temporary, 'w') as handle:
+            json.dump(meta, handle)
+        os.replace(temporary, os.path.join(path, META))
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, META)) as handle:
+            meta = json.load(handle)
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in FILES}
+        return cls(mean=meta['mean'], regularization=meta['regularization'], **arrays)
+
+
+_model = None
+_model_mtime = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """The trained model at RECOMMENDER['ALS_PATH'], reloaded after retraining; None if untrained"""
+    global _model, _model_mtime
+    path = get_config()['ALS_PATH']
+    try:
+        mtime = os.stat(os.path.join(path, META)).st_mtime
+    except (OSError, TypeError):
+        return None
+    with _model_lock:
+        if _model is None or mtime != _model_mtime:
+            _model = ALSModel.load(path)
+            _model_mtime = mtime
+        return _model
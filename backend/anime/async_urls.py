@@ -0,0 +1,11 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('anime/search/', async_views.anime_search),
+    path('anime/trending/', async_views.trending_anime),
+    path('anime/recommendations/', async_views.anime_recommendations),
+    path('anime/<int:anime_id>/', async_views.anime_detail),
+    path('anime/<int:anime_id>/comments/', async_views.anime_comments),
+    path('anime/<int:anime_id>/ratings/', async_views.anime_ratings),
+]
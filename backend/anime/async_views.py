@@ -0,0 +1,225 @@
+"""
+Async-native versions of the read-heavy endpoints, mounted under /api/async/.
+
+Served by an ASGI server (uvicorn anime_backend.asgi:application), a request
+waiting on the database no longer holds a worker thread. Queries use the
+async ORM, and the independent ones of a request (the detail page's anime,
+comments and the user's own score) are awaited together with
+asyncio.gather. Responses match the DRF endpoints they mirror, go through
+the same versioned response cache, and reuse the same serializers on rows
+that are fully loaded before serialization.
+
+Django 4.2 runs each async ORM call on the request's own database thread, so
+the gain is that many requests are in flight at once. Queries within one
+request still run one after another.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import search, trending
+from .cache import cache_async_response
+from .models import Anime, Comment, Rating
+from .pagination import CreatedAtCursorPagination
+from .pipeline import RecommendationPipeline
+from .serializers import (
+    AnimeDetailSerializer, AnimeSerializer, CommentSerializer, RatingSerializer,
+    detail_summary
+)
+from .versions import (
+    CATALOGUE, COMMENTS, GENRES, RANKING, RATINGS, TRENDING, anime_comments_version,
+    anime_ratings_version, anime_version
+)
+
+User = get_user_model()
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+_jwt = JWTAuthentication()
+
+
+def read_only(view):
+    """require_safe for async views; Django 4.2's method decorators only wrap sync views"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def authenticate(request):
+    """
+    The user of the request's bearer token, or None without one. Token
+    checks are JWTAuthentication's; only the user lookup is async.
+    """
+    header = _jwt.get_header(request)
+    raw_token = header and _jwt.get_raw_token(header)
+    if raw_token is None:
+        return None
+    token = _jwt.get_validated_token(raw_token)
+    try:
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+        return await User.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id}, is_active=True)
+    except (KeyError, User.DoesNotExist):
+        raise AuthenticationFailed('User not found')
+
+
+def error(message, status_code):
+    return JsonResponse({'error': message}, status=status_code)
+
+
+def unauthorized(exception):
+    detail = exception.detail if isinstance(exception.detail, dict) else {'detail': exception.detail}
+    return JsonResponse(detail, status=status.HTTP_401_UNAUTHORIZED)
+
+
+async def fetch(queryset):
+    return [row async for row in queryset]
+
+
+async def load_anime(anime_ids):
+    """Anime with `anime_ids`, in that order, genres prefetched"""
+    # A prefetch runs as part of the one fetch that async iteration hands off
+    queryset = Anime.objects.filter(pk__in=anime_ids).prefetch_related('genres')
+    anime_by_id = {anime.pk: anime async for anime in queryset}
+    return [anime_by_id[pk] for pk in anime_ids if pk in anime_by_id]
+
+
+def search_ids(query, limit, offset):
+    # Picking the backend may itself query the database
+    return search.get_backend().search(query, limit, offset)
+
+
+@read_only
+@cache_async_response(CATALOGUE, RATINGS)
+async def anime_search(request):
+    query = request.GET.get('q', '')
+    if not query:
+        return JsonResponse([], safe=False)
+    try:
+        limit = min(int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT)
+        offset = int(request.GET.get('offset', 0))
+        if limit < 1 or offset < 0:
+            raise ValueError
+    except ValueError:
+        return error('limit and offset must be non-negative integers', status.HTTP_400_BAD_REQUEST)
+
+    # The full-text index is queried with raw SQL, which has no async API
+    anime_ids = await sync_to_async(search_ids)(query, limit, offset)
+    anime_list = await load_anime(anime_ids)
+    return JsonResponse(AnimeSerializer(anime_list, many=True).data, safe=False)
+
+
+@read_only
+@cache_async_response(TRENDING, CATALOGUE, RATINGS, COMMENTS)
+async def trending_anime(request):
+    window = request.GET.get('window', trending.DEFAULT_WINDOW)
+    if window not in trending.WINDOWS:
+        return error(f"window must be one of: {', '.join(trending.WINDOWS)}", status.HTTP_400_BAD_REQUEST)
+
+    anime_ids = [pk async for pk in trending.leaderboard(window).values_list('anime_id', flat=True)]
+    if not anime_ids:
+        # Leaderboard not computed yet: rank by activity counters instead,
+        # counting comments only for the most rated candidates
+        popular = Anime.objects.order_by('-rating_count', '-weighted_score').values('pk')[:50]
+        fallback = Anime.objects.filter(pk__in=popular).annotate(
+            comment_count=Count('comments')
+        ).order_by('-rating_count', '-comment_count', '-weighted_score').values_list('pk', flat=True)[:10]
+        anime_ids = [pk async for pk in fallback]
+    anime_list = await load_anime(anime_ids)
+    return JsonResponse(AnimeSerializer(anime_list, many=True).data, safe=False)
+
+
+@read_only
+@cache_async_response(CATALOGUE, RATINGS, anonymous_only=True)
+async def anime_recommendations(request):
+    try:
+        user = await authenticate(request)
+    except AuthenticationFailed as exception:
+        return unauthorized(exception)
+    anime_id = request.GET.get('anime_id')
+    pipeline = RecommendationPipeline(
+        user_id=user.pk if user else None,
+        anime_id=int(anime_id) if anime_id and anime_id.isdigit() else None,
+        genres=request.GET.getlist('genres'),
+        anime_type=request.GET.get('type', ''),
+    )
+    # Scoring is CPU work against in-memory indexes between a few queries
+    results = await sync_to_async(pipeline.run)()
+    response = JsonResponse(AnimeSerializer(results, many=True).data, safe=False)
+    response['Server-Timing'] = pipeline.timings.header()
+    return response
+
+
+async def user_score(user, anime_id):
+    if user is None:
+        return None
+    return await Rating.objects.filter(user=user, anime_id=anime_id).values_list('score', flat=True).afirst()
+
+
+@read_only
+@cache_async_response(anime_version('{anime_id}'), GENRES, CATALOGUE, RANKING, anonymous_only=True)
+async def anime_detail(request, anime_id):
+    """The detail page with its summary, plus the caller's own score"""
+    try:
+        user = await authenticate(request)
+    except AuthenticationFailed as exception:
+        return unauthorized(exception)
+
+    latest_comments = Comment.objects.filter(anime_id=anime_id).select_related('user').order_by(
+        '-created_at', '-id'
+    )[:AnimeDetailSerializer.latest_comments]
+    try:
+        anime, comment_count, latest_comments, score = await asyncio.gather(
+            Anime.objects.prefetch_related('genres').aget(pk=anime_id),
+            Comment.objects.filter(anime_id=anime_id).acount(),
+            fetch(latest_comments),
+            user_score(user, anime_id),
+        )
+    except Anime.DoesNotExist:
+        return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    summary = detail_summary(anime, comment_count, latest_comments)
+    data = AnimeDetailSerializer(anime, context={'summary': summary}).data
+    data['user_score'] = score
+    return JsonResponse(data)
+
+
+async def paginated(request, anime_id, queryset, serializer_class):
+    """One keyset page of `queryset`, checking that the anime exists at the same time"""
+    paginator = CreatedAtCursorPagination()
+    try:
+        exists, page = await asyncio.gather(
+            Anime.objects.filter(pk=anime_id).aexists(),
+            paginator.apaginate_queryset(queryset, Request(request)),
+        )
+    except NotFound as exception:
+        return JsonResponse({'detail': str(exception.detail)}, status=status.HTTP_404_NOT_FOUND)
+    if not exists:
+        return error('Anime not found', status.HTTP_404_NOT_FOUND)
+    return JsonResponse(paginator.get_paginated_data(serializer_class(page, many=True).data))
+
+
+@read_only
+@cache_async_response(anime_comments_version('{anime_id}'))
+async def anime_comments(request, anime_id):
+    comments = Comment.objects.filter(anime_id=anime_id).select_related('user')
+    return await paginated(request, anime_id, comments, CommentSerializer)
+
+
+@read_only
+@cache_async_response(anime_ratings_version('{anime_id}'))
+async def anime_ratings(request, anime_id):
+    ratings = Rating.objects.filter(anime_id=anime_id).select_related('user')
+    return await paginated(request, anime_id, ratings, RatingSerializer)
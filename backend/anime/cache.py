@@ -0,0 +1,145 @@
+"""
+Response caching for read endpoints.
+
+Rendered response bytes are cached under a key made of the view, the path,
+the normalized query string and the current version of every namespace the
+view depends on (see anime.versions). Model signals bump those versions on
+writes, so stale entries are simply never addressed again and age out of the
+cache. A hit costs two cache lookups and no database access.
+"""
+import functools
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, urlencode
+
+from .versions import get_versions
+
+KEY_PREFIX = 'anime:response:'
+
+
+def get_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def response_cache_key(view_name, request, dependencies):
+    """Key for `view_name`'s response to `request` at the current versions of `dependencies`"""
+    versions = get_versions(dependencies)
+    query = urlencode(sorted((key, sorted(values)) for key, values in request.GET.lists()), doseq=True)
+    wants_html = 'text/html' in request.META.get('HTTP_ACCEPT', '')
+    parts = [
+        view_name, request.path, query, 'html' if wants_html else 'json',
+        *(f'{name}={versions[name]}' for name in sorted(versions)),
+    ]
+    return KEY_PREFIX + hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def make_entry(response):
+    """Cache entry for a rendered response, or None if it should not be cached"""
+    if response.status_code != 200:
+        return None
+    if not response.get('Content-Type', '').startswith('application/json'):
+        return None
+    return {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': '"%s"' % hashlib.md5(response.content).hexdigest(),
+        'headers': {name: value for name, value in response.items() if name.startswith('X-')},
+    }
+
+
+def entry_response(entry):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    for name, value in entry['headers'].items():
+        response[name] = value
+    return response
+
+
+def finalize(request, response, entry):
+    """Answer a matching If-None-Match with 304 and tag the response"""
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if entry['etag'] in etags or '*' in etags:
+        response = HttpResponseNotModified()
+    response['ETag'] = entry['etag']
+    patch_vary_headers(response, ('Accept', 'Authorization'))
+    return response
+
+
+def is_cacheable(request, anonymous_only):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if anonymous_only and 'HTTP_AUTHORIZATION' in request.META:
+        return False
+    return bool(get_timeout())
+
+
+class CachedResponseMixin:
+    """
+    Cache successful JSON GET responses of an APIView or ViewSet.
+
+    `cache_dependencies` lists the version namespaces the response is built
+    from; entries may use the URL kwargs, e.g. 'comments:{anime_id}'. With
+    `cache_anonymous_only`, requests carrying credentials bypass the cache.
+    """
+    cache_dependencies = ()
+    cache_anonymous_only = False
+
+    def get_cache_dependencies(self, request, *args, **kwargs):
+        return [name.format(**kwargs) for name in self.cache_dependencies]
+
+    def get_cache_key(self, request, *args, **kwargs):
+        dependencies = self.get_cache_dependencies(request, *args, **kwargs)
+        return response_cache_key(type(self).__name__, request, dependencies)
+
+    def is_cacheable_request(self, request):
+        return is_cacheable(request, self.cache_anonymous_only)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = self.get_cache_key(request, *args, **kwargs)
+        entry = cache.get(key)
+        if entry is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            # DRF only settles the content type while rendering
+            response.render()
+            entry = make_entry(response)
+            if entry is None:
+                return response
+            cache.set(key, entry, get_timeout())
+        else:
+            response = entry_response(entry)
+        return finalize(request, response, entry)
+
+
+def cache_async_response(*dependencies, anonymous_only=False):
+    """
+    CachedResponseMixin for async function views: `dependencies` may use the
+    URL kwargs, and the view must return a JsonResponse
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, **kwargs):
+            if not is_cacheable(request, anonymous_only):
+                return await view(request, **kwargs)
+            names = [name.format(**kwargs) for name in dependencies]
+            key = await sync_to_async(response_cache_key)(view.__name__, request, names)
+            entry = await cache.aget(key)
+            if entry is None:
+                response = await view(request, **kwargs)
+                entry = make_entry(response)
+                if entry is None:
+                    return response
+                await cache.aset(key, entry, get_timeout())
+            else:
+                response = entry_response(entry)
+            return finalize(request, response, entry)
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+"""
+Cold-start recommendations sampled from in-memory pools.
+
+When the pipeline finds too few candidates, it tops the results up with
+well-rated, popular anime. Those are drawn from pools built once per catalogue
+version from ids, types, ratings and genre links, never from full rows:
+
+- one pool of the best anime overall,
+- one pool per genre,
+- one pool per type.
+
+Each pool keeps its entries best first, with cumulative sampling weights.
+Drawing k anime is then k bisections plus a few rejections, whatever the size
+of the catalogue.
+"""
+import bisect
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+
+from .models import Anime
+from .recommender import get_config
+from .versions import CATALOGUE, get_version
+
+# Anime kept in the overall pool, and in each genre and type pool
+POOL_SIZE = 1000
+FILTERED_POOL_SIZE = 300
+
+# Filtered pools combined on demand (several genres, or genre and type)
+MAX_COMBINED = 256
+
+_random = random.Random()
+
+
+def weight(rating, rating_count):
+    """Sampling weight: the rating, boosted logarithmically by how many users rated"""
+    return max(rating, 0.1) * (1 + math.log1p(rating_count))
+
+
+class Pool:
+    def __init__(self, entries):
+        # (weight, anime_id) pairs, best first
+        self.anime_ids = [anime_id for _, anime_id in entries]
+        self.cumulative = list(itertools.accumulate(entry_weight for entry_weight, _ in entries))
+
+    def __len__(self):
+        return len(self.anime_ids)
+
+    def sample(self, k, exclude=()):
+        """Up to k distinct anime ids, drawn by weight without replacement"""
+        picked = []
+        seen = set(exclude)
+        if not self.anime_ids:
+            return picked
+        total = self.cumulative[-1]
+        # Rejections only bite when most of the pool is excluded; then walk it in order
+        for _ in range(k * 4):
+            if len(picked) == k:
+                return picked
+            anime_id = self.anime_ids[
+                min(bisect.bisect_right(self.cumulative, _random.random() * total), len(self.anime_ids) - 1)
+            ]
+            if anime_id not in seen:
+                seen.add(anime_id)
+                picked.append(anime_id)
+        for anime_id in self.anime_ids:
+            if len(picked) == k:
+                break
+            if anime_id not in seen:
+                seen.add(anime_id)
+                picked.append(anime_id)
+        return picked
+
+
+class ColdStartPools:
+    def __init__(self):
+        self.overall = Pool([])
+        self.by_genre = {}
+        self.by_type = {}
+        self.weights = {}
+        self.types = {}
+        self.version = None
+        self.built_at = time.monotonic()
+        self._combined = {}
+        self._lock = threading.Lock()
+
+    def build(self, version=None):
+        rows = Anime.objects.values_list('pk', 'type', 'rating', 'rating_count').iterator(chunk_size=5000)
+        genre_members = {}
+        for pk, anime_type, rating, rating_count in rows:
+            self.weights[pk] = weight(rating, rating_count)
+            self.types[pk] = anime_type
+        links = Anime.genres.through.objects.values_list('anime_id', 'genre_id').iterator(chunk_size=10000)
+        for anime_id, genre_id in links:
+            genre_members.setdefault(genre_id, []).append(anime_id)
+        type_members = {}
+        for pk, anime_type in self.types.items():
+            type_members.setdefault(anime_type, []).append(pk)
+
+        self.overall = self.pool(self.weights, POOL_SIZE)
+        self.by_genre = {genre: self.pool(members, FILTERED_POOL_SIZE) for genre, members in genre_members.items()}
+        self.by_type = {name: self.pool(members, FILTERED_POOL_SIZE) for name, members in type_members.items()}
+        self.version = version
+        return self
+
+    def pool(self, anime_ids, size):
+        return Pool(heapq.nlargest(size, ((self.weights[pk], pk) for pk in anime_ids if pk in self.weights)))
+
+    def select(self, genres=(), anime_type=''):
+        """The pool matching the filters: any of `genres`, and `anime_type`"""
+        genres = tuple(sorted(set(genres)))
+        if not genres:
+            return self.by_type.get(anime_type, Pool([])) if anime_type else self.overall
+        if len(genres) == 1 and not anime_type:
+            return self.by_genre.get(genres[0], Pool([]))
+        key = (genres, anime_type)
+        with self._lock:
+            combined = self._combined.get(key)
+        if combined is None:
+            anime_ids = {
+                pk
+                for genre in genres
+                for pk in self.by_genre.get(genre, Pool([])).anime_ids
+                if not anime_type or self.types[pk] == anime_type
+            }
+            combined = self.pool(anime_ids, FILTERED_POOL_SIZE)
+            with self._lock:
+                if len(self._combined) >= MAX_COMBINED:
+                    self._combined.clear()
+                self._combined[key] = combined
+        return combined
+
+    def sample(self, k, genres=(), anime_type='', exclude=()):
+        return self.select(genres, anime_type).sample(k, exclude)
+
+    def top(self, k):
+        """The k best anime overall"""
+        return self.overall.anime_ids[:k]
+
+
+_pools = None
+_pools_lock = threading.Lock()
+
+
+def get_pools():
+    """Process-wide pools, rebuilt when the catalogue changes or after the recommender's MAX_AGE"""
+    global _pools
+    version = get_version(CATALOGUE)
+    max_age = get_config()['MAX_AGE']
+    pools = _pools
+    if pools is None or pools.version != version or time.monotonic() - pools.built_at > max_age:
+        with _pools_lock:
+            pools = _pools
+            if pools is None or pools.version != version or time.monotonic() - pools.built_at > max_age:
+                _pools = pools = ColdStartPools().build(version=version)
+    return pools
+
+
+def sample(k, genres=(), anime_type='', exclude=()):
+    """Up to k anime ids matching the filters, favouring popular, well-rated anime"""
+    return get_pools().sample(k, genres, anime_type, exclude)
@@ -0,0 +1,266 @@
+"""
+Content-based similarity between anime.
+
+Each anime becomes one sparse vector made of four blocks: multi-hot genres,
+one-hot type, one-hot studio and TF-IDF weighted description terms. Every
+block is L2-normalised and scaled by the square root of its weight, so the
+cosine of two vectors is the weighted average of the per-block cosines. The
+top-K neighbours of every anime are computed with chunked sparse products
+and stored in SimilarAnime.
+
+The feature matrix is kept in memory per process (rebuilt after the
+recommender's MAX_AGE). When an anime or its genres change, model signals
+only queue its id in ContentRefresh; `build_content_index --pending` drains
+the queue through update(), which recomputes those anime's vectors and only
+the neighbour lists they can enter or leave, instead of every pair. Terms,
+studios and genres first seen after the matrix was built are ignored until
+it is rebuilt.
+"""
+import math
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Anime, ContentRefresh, SimilarAnime
+from .recommender import get_config
+from .search import tokenize
+
+# Relative weight of each block in the combined cosine
+WEIGHTS = {'genres': 1.0, 'type': 0.2, 'studio': 0.4, 'description': 0.6}
+
+MAX_TERMS = 20000
+MIN_TERM_ANIME = 2
+# Terms in more than this share of descriptions carry no signal
+MAX_TERM_SHARE = 0.5
+
+# Rows scored per sparse product; bounds the dense chunk x catalogue block
+CHUNK_SIZE = 256
+
+# Above this many changed anime, update() rebuilds everything instead
+INCREMENTAL_LIMIT = 200
+
+
+def _rows(anime_ids=None):
+    """(id, type, studio, description, [genre ids]) for the given anime, or all"""
+    queryset = Anime.objects.order_by('pk')
+    if anime_ids is not None:
+        queryset = queryset.filter(pk__in=list(anime_ids))
+    rows = {
+        pk: (pk, anime_type, studio, description, [])
+        for pk, anime_type, studio, description in queryset.values_list('pk', 'type', 'studio', 'description')
+    }
+    through = Anime.genres.through.objects.all()
+    if anime_ids is not None:
+        through = through.filter(anime_id__in=list(rows))
+    for anime_id, genre_id in through.values_list('anime_id', 'genre_id').iterator(chunk_size=10000):
+        if anime_id in rows:
+            rows[anime_id][4].append(genre_id)
+    return list(rows.values())
+
+
+def _normalize(matrix, weight):
+    """L2-normalise every row, then scale it by sqrt(weight)"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(math.sqrt(weight) / norms) @ matrix
+
+
+class ContentIndex:
+    def __init__(self, genres, types, studios, terms, idf):
+        self.columns = {
+            'genres': {genre: index for index, genre in enumerate(genres)},
+            'type': {name: index for index, name in enumerate(types)},
+            'studio': {name: index for index, name in enumerate(studios)},
+            'description': {term: index for index, term in enumerate(terms)},
+        }
+        self.idf = idf
+        self.anime_ids = np.empty(0, dtype=np.int64)
+        self.positions = {}
+        self.matrix = sparse.csr_matrix((0, sum(len(block) for block in self.columns.values())))
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, rows):
+        """Fit the vocabularies and IDF weights to `rows` and vectorise them"""
+        document_frequency = Counter()
+        for _, _, _, description, _ in rows:
+            document_frequency.update(set(tokenize(description)))
+        limit = max(MIN_TERM_ANIME, MAX_TERM_SHARE * len(rows))
+        terms = [
+            term for term, count in document_frequency.most_common()
+            if MIN_TERM_ANIME <= count <= limit
+        ][:MAX_TERMS]
+        idf = np.array([math.log((1 + len(rows)) / (1 + document_frequency[term])) + 1 for term in terms])
+
+        index = cls(
+            genres=sorted({genre for row in rows for genre in row[4]}),
+            types=sorted({row[1] for row in rows}),
+            studios=sorted({row[2] for row in rows if row[2]}),
+            terms=terms,
+            idf=idf,
+        )
+        index.anime_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        index.positions = {pk: position for position, pk in enumerate(index.anime_ids.tolist())}
+        index.matrix = index.vectorize(rows)
+        return index
+
+    def vectorize(self, rows):
+        """Combined, unit-length feature rows for `rows`"""
+        blocks = []
+        for name in ('genres', 'type', 'studio', 'description'):
+            columns = self.columns[name]
+            data, indices, indptr = [], [], [0]
+            for _, anime_type, studio, description, genres in rows:
+                if name == 'genres':
+                    values = {columns[genre]: 1.0 for genre in genres if genre in columns}
+                elif name == 'type':
+                    values = {columns[anime_type]: 1.0} if anime_type in columns else {}
+                elif name == 'studio':
+                    values = {columns[studio]: 1.0} if studio in columns else {}
+                else:
+                    counts = Counter(term for term in tokenize(description) if term in columns)
+                    values = {
+                        columns[term]: (1 + math.log(count)) * self.idf[columns[term]]
+                        for term, count in counts.items()
+                    }
+                indices.extend(values)
+                data.extend(values.values())
+                indptr.append(len(indices))
+            block = sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(columns)))
+            blocks.append(_normalize(block, WEIGHTS[name]))
+        return _normalize(sparse.hstack(blocks, format='csr'), 1.0)
+
+    def neighbours(self, positions, top_k):
+        """{anime_id: [(similar_id, score), ...]} for the anime at `positions`"""
+        result = {}
+        for start in range(0, len(positions), CHUNK_SIZE):
+            chunk = positions[start:start + CHUNK_SIZE]
+            # Nearly every pair shares a genre, so multiply against a dense
+            # chunk rather than building a sparse product that is not sparse
+            scores = (self.matrix @ self.matrix[chunk].T.toarray()).T
+            scores[np.arange(len(chunk)), chunk] = -1.0
+            k = min(top_k, scores.shape[1] - 1)
+            if k <= 0:
+                result.update({int(self.anime_ids[position]): [] for position in chunk})
+                continue
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for row, position in enumerate(chunk):
+                best = top[row][np.argsort(-scores[row, top[row]])]
+                result[int(self.anime_ids[position])] = [
+                    (int(self.anime_ids[column]), float(scores[row, column]))
+                    for column in best if scores[row, column] > 0
+                ]
+        return result
+
+    def replace(self, rows, removed=()):
+        """Swap in fresh vectors for `rows` and drop the `removed` anime ids"""
+        dropped = set(removed) | {row[0] for row in rows}
+        keep = [position for pk, position in self.positions.items() if pk not in dropped]
+        anime_ids = np.concatenate([self.anime_ids[keep], np.array([row[0] for row in rows], dtype=np.int64)])
+        matrix = sparse.vstack([self.matrix[keep], self.vectorize(rows)], format='csr')
+        order = np.argsort(anime_ids, kind='stable')
+        self.anime_ids = anime_ids[order]
+        self.matrix = matrix[order]
+        self.positions = {pk: position for position, pk in enumerate(self.anime_ids.tolist())}
+
+
+def _store(neighbours, stale):
+    """Delete the `stale` rows and store the lists in `neighbours` in their place"""
+    with transaction.atomic():
+        stale.delete()
+        SimilarAnime.objects.bulk_create([
+            SimilarAnime(anime_id=anime_id, similar_id=similar_id, score=score, rank=rank)
+            for anime_id, similar in neighbours.items()
+            for rank, (similar_id, score) in enumerate(similar, 1)
+        ], batch_size=2000)
+
+
+_index = None
+_index_lock = threading.RLock()
+
+
+def get_index():
+    """The process-wide feature matrix, rebuilt from the database when missing or older than MAX_AGE"""
+    global _index
+    with _index_lock:
+        if _index is None or time.monotonic() - _index.built_at > get_config()['MAX_AGE']:
+            _index = ContentIndex.build(_rows())
+        return _index
+
+
+def rebuild():
+    """Recompute every anime's neighbours from scratch; returns the number of anime"""
+    global _index
+    started = timezone.now()
+    with _index_lock:
+        _index = ContentIndex.build(_rows())
+        neighbours = _index.neighbours(list(range(len(_index.anime_ids))), get_config()['CONTENT_TOP_K'])
+        _store(neighbours, SimilarAnime.objects.all())
+        # Everything queued before the rows were read is covered
+        ContentRefresh.objects.filter(requested_at__lte=started).delete()
+        return len(_index.anime_ids)
+
+
+def update(anime_ids, affected=()):
+    """
+    Refresh the neighbour lists touched by changes to `anime_ids`. `affected`
+    adds anime whose lists held a deleted anime, since those rows cascade away.
+    """
+    anime_ids = set(anime_ids)
+    if not anime_ids:
+        return
+    if len(anime_ids) > INCREMENTAL_LIMIT:
+        rebuild()
+        return
+    top_k = get_config()['CONTENT_TOP_K']
+    with _index_lock:
+        index = get_index()
+        rows = _rows(anime_ids)
+        removed = anime_ids - {row[0] for row in rows}
+        # Lists that hold a changed anime may lose it or reorder
+        affected = set(affected) | set(
+            SimilarAnime.objects.filter(similar_id__in=list(anime_ids)).values_list('anime_id', flat=True)
+        )
+        index.replace(rows, removed)
+
+        changed = [index.positions[row[0]] for row in rows]
+        if changed:
+            # Lists whose weakest entry a changed anime now beats (or that are not full)
+            weakest = dict(SimilarAnime.objects.filter(rank=top_k).values_list('anime_id', 'score'))
+            scores = (index.matrix @ index.matrix[changed].T.toarray()).max(axis=1)
+            for position in np.flatnonzero(scores > 0).tolist():
+                pk = int(index.anime_ids[position])
+                if scores[position] > weakest.get(pk, 0.0):
+                    affected.add(pk)
+
+        affected = (affected | {row[0] for row in rows}) - removed
+        positions = sorted(index.positions[pk] for pk in affected if pk in index.positions)
+        neighbours = index.neighbours(positions, top_k)
+        _store(neighbours, SimilarAnime.objects.filter(anime_id__in=list(neighbours)))
+
+
+def enqueue(anime_ids):
+    """Queue anime whose neighbour lists need refreshing, in one upsert"""
+    now = timezone.now()
+    ContentRefresh.objects.bulk_create(
+        [ContentRefresh(anime_id=pk, requested_at=now) for pk in set(anime_ids)],
+        update_conflicts=True,
+        unique_fields=['anime_id'],
+        update_fields=['requested_at'],
+    )
+
+
+def process_queue():
+    """Refresh the neighbours of every queued anime; returns how many were queued"""
+    started = timezone.now()
+    anime_ids = list(ContentRefresh.objects.filter(requested_at__lte=started).values_list('anime_id', flat=True))
+    if anime_ids:
+        update(anime_ids)
+        # Anime changed again since `started` stay queued
+        ContentRefresh.objects.filter(requested_at__lte=started).delete()
+    return len(anime_ids)
@@ -0,0 +1,213 @@
+import json
+import platform
+import random
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from anime.models import Anime, Rating
+from users.models import Watchlist
+
+User = get_user_model()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = min(max(int(round(fraction * len(ordered) + 0.5)) - 1, 0), len(ordered) - 1)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the hot API endpoints through the Django test client and report latency '
+        'percentiles, query counts and peak memory as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per endpoint')
+        parser.add_argument('--memory-requests', type=int, default=20, help='Requests traced for peak memory')
+        parser.add_argument('--endpoint', action='append', help='Only run endpoints whose name contains this')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the response cache')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+        parser.add_argument('--compare', help='Previous JSON report to print p95 changes against')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        if not Anime.objects.exists():
+            raise CommandError('No anime to benchmark; run seed_data or generate_load_data first')
+        # Anime ids weighted towards the most rated, like real traffic
+        self.anime_ids = list(Anime.objects.order_by('-rating_count').values_list('pk', flat=True)[:2000])
+        self.terms = [
+            word for title in Anime.objects.filter(pk__in=self.anime_ids[:200]).values_list('title', flat=True)
+            for word in title.split() if len(word) > 2
+        ] or ['a']
+        self.user = self.benchmark_user()
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+        endpoints = self.endpoints()
+        if options['endpoint']:
+            endpoints = [e for e in endpoints if any(name in e[0] for name in options['endpoint'])]
+
+        results = {}
+        cache_context = override_settings(RESPONSE_CACHE_TIMEOUT=0) if options['no_cache'] else nullcontext()
+        try:
+            with cache_context:
+                for name, method, make_request, authenticated in endpoints:
+                    client = APIClient(SERVER_NAME='localhost')
+                    if authenticated:
+                        # A real bearer token, so authentication and cache bypass are measured too
+                        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+                    results[name] = self.measure(client, method, make_request, options)
+                    self.stderr.write(
+                        f'{name:<28} p50 {results[name]["p50_ms"]:>8.2f}ms  p95 {results[name]["p95_ms"]:>8.2f}ms  '
+                        f'p99 {results[name]["p99_ms"]:>8.2f}ms  {results[name]["queries_max"]:>3} queries'
+                    )
+        finally:
+            self.clean_up()
+
+        report = {'meta': self.meta(options), 'endpoints': results}
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(payload + '\n')
+        else:
+            self.stdout.write(payload)
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def benchmark_user(self):
+        # Writes (ratings, watchlist) go to a dedicated user and are undone afterwards
+        user, _ = User.objects.get_or_create(
+            username='benchmark', defaults={'email': 'benchmark@example.com'}
+        )
+        # Give it some history so personalised paths do real work
+        if not Rating.objects.filter(user=user).exists():
+            for anime_id in self.rng.sample(self.anime_ids, min(20, len(self.anime_ids))):
+                Rating.objects.create(user=user, anime_id=anime_id, score=self.rng.randint(5, 10))
+        return user
+
+    def clean_up(self):
+        # Queryset deletes send the signals that keep counters and caches right
+        Rating.objects.filter(user=self.user).delete()
+        Watchlist.objects.filter(user=self.user).delete()
+
+    def anime_id(self):
+        # Squaring skews picks towards the popular end of the list
+        return self.anime_ids[int(len(self.anime_ids) * self.rng.random() ** 2)]
+
+    def grid(self):
+        """Ids of one 24-card page, as the frontend would batch them"""
+        return ','.join(str(self.anime_id()) for _ in range(24))
+
+    def endpoints(self):
+        """(name, method, request factory returning (path, data), authenticated)"""
+        return [
+            ('anime list', 'get', lambda: ('/api/anime/', None), False),
+            ('anime list by year', 'get', lambda: ('/api/anime/?ordering=-year', None), False),
+            ('anime detail', 'get', lambda: (f'/api/anime/{self.anime_id()}/', None), False),
+            ('search', 'get', lambda: (f'/api/anime/search/?q={self.rng.choice(self.terms)}', None), False),
+            ('suggest', 'get', lambda: (f'/api/anime/suggest/?q={self.rng.choice(self.terms)[:3]}', None), False),
+            ('trending', 'get', lambda: ('/api/anime/trending/', None), False),
+            ('trending 7d', 'get', lambda: ('/api/anime/trending/?window=7d', None), False),
+            ('recommendations', 'get', lambda: ('/api/anime/recommendations/', None), False),
+            ('recommendations (user)', 'get', lambda: ('/api/anime/recommendations/', None), True),
+            (
+                'recommendations (similar)', 'get',
+                lambda: (f'/api/anime/recommendations/?anime_id={self.anime_id()}', None), False
+            ),
+            ('comments', 'get', lambda: (f'/api/anime/{self.anime_id()}/comments/', None), False),
+            ('ratings', 'get', lambda: (f'/api/anime/{self.anime_id()}/ratings/', None), False),
+            (
+                'rate', 'post',
+                lambda: (f'/api/anime/{self.anime_id()}/rate/', {'score': self.rng.randint(1, 10)}), True
+            ),
+            ('watchlist', 'get', lambda: ('/api/auth/watchlist/', None), True),
+            ('watchlist add', 'post', lambda: ('/api/auth/watchlist/add/', {'anime_id': self.anime_id()}), True),
+            (
+                'watchlist check', 'get',
+                lambda: (f'/api/auth/watchlist/check/{self.anime_id()}/', None), True
+            ),
+            ('watchlist check (batch)', 'get', lambda: (f'/api/auth/watchlist/check/?ids={self.grid()}', None), True),
+            ('user ratings (batch)', 'get', lambda: (f'/api/anime/user-ratings/?ids={self.grid()}', None), True),
+        ]
+
+    def request(self, client, method, make_request):
+        path, data = make_request()
+        if method == 'post':
+            return client.post(path, data, format='json')
+        return client.get(path)
+
+    def measure(self, client, method, make_request, options):
+        for _ in range(options['warmup']):
+            self.request(client, method, make_request)
+
+        timings, queries, statuses = [], [], {}
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(client, method, make_request)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        # Traced separately: tracemalloc slows every allocation down
+        tracemalloc.start()
+        try:
+            peak = 0
+            for _ in range(options['memory_requests']):
+                tracemalloc.reset_peak()
+                self.request(client, method, make_request)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'method': method.upper(),
+            'requests': len(timings),
+            'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'queries_p50': percentile(queries, 0.50),
+            'queries_max': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def meta(self, options):
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'response_cache': not options['no_cache'] and settings.RESPONSE_CACHE_TIMEOUT > 0,
+            'python': platform.python_version(),
+            'anime': Anime.objects.count(),
+            'users': User.objects.count(),
+            'ratings': Rating.objects.count(),
+            'requests': options['requests'],
+            'seed': options['seed'],
+        }
+
+    def compare(self, path, results):
+        with open(path) as handle:
+            previous = json.load(handle)['endpoints']
+        for name, current in results.items():
+            if name not in previous:
+                continue
+            before, after = previous[name]['p95_ms'], current['p95_ms']
+            change = (after - before) / before * 100 if before else 0.0
+            line = f'{name:<28} p95 {before:>8.2f}ms -> {after:>8.2f}ms ({change:+.1f}%)'
+            self.stderr.write(self.style.ERROR(line) if change > 10 else line)
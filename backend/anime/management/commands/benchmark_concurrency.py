@@ -0,0 +1,249 @@
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+
+from anime.management.commands.benchmark_api import percentile
+from anime.models import Anime
+
+HOST = 'localhost'
+
+
+def add_query_latency(seconds):
+    """Sleep before every query on connections opened from now on, like a remote database"""
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        # A thread reconnects through the same wrapper object after each request
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install, weak=False)
+
+
+def wsgi_get(application, path):
+    """GET `path` from a WSGI application, as one thread of a threaded server would"""
+    url = urlsplit(path)
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': BytesIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        b''.join(body)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_get(application, path):
+    """GET `path` from an ASGI application, as uvicorn would"""
+    url = urlsplit(path)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': url.path,
+        'raw_path': url.path.encode(),
+        'query_string': url.query.encode(),
+        'root_path': '',
+        'headers': [(b'host', HOST.encode())],
+        'client': ('127.0.0.1', 50000),
+        'server': (HOST, 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects
+        await asyncio.Future()
+
+    status = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput and latency of the WSGI endpoints and their /api/async/ '
+        'counterparts at increasing numbers of concurrent requests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, action='append',
+            help='Requests in flight at once (repeatable; default 1, 8 and 32)'
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint and level')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per endpoint and path')
+        parser.add_argument(
+            '--query-latency', type=float, default=0,
+            help='Milliseconds added to every query, to model a database across the network'
+        )
+        parser.add_argument(
+            '--wsgi-threads', type=int,
+            help='Threads of the WSGI server (default: one per concurrent request)'
+        )
+        parser.add_argument('--endpoint', action='append', help='Only run endpoints whose name contains this')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the response cache')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.anime_ids = list(Anime.objects.order_by('-rating_count').values_list('pk', flat=True)[:2000])
+        if not self.anime_ids:
+            raise CommandError('No anime to benchmark; run seed_data or generate_load_data first')
+        self.terms = [
+            word for title in Anime.objects.filter(pk__in=self.anime_ids[:200]).values_list('title', flat=True)
+            for word in title.split() if len(word) > 2
+        ] or ['a']
+        levels = sorted(set(options['concurrency'] or [1, 8, 32]))
+        endpoints = self.endpoints()
+        if options['endpoint']:
+            endpoints = [e for e in endpoints if any(name in e[0] for name in options['endpoint'])]
+
+        wsgi, asgi = get_wsgi_application(), get_asgi_application()
+        # The handlers open their own connections, per thread
+        connection.close()
+        if options['query_latency']:
+            add_query_latency(options['query_latency'] / 1000)
+        results = {}
+        cache_context = override_settings(RESPONSE_CACHE_TIMEOUT=0) if options['no_cache'] else nullcontext()
+        with cache_context:
+            for name, make_path in endpoints:
+                paths = [make_path() for _ in range(options['requests'])]
+                warmup = [make_path() for _ in range(options['warmup'])]
+                self.run_wsgi(wsgi, warmup, 1, None)
+                asyncio.run(self.run_asgi(asgi, [self.async_path(path) for path in warmup], 1))
+                results[name] = {}
+                for level in levels:
+                    row = {
+                        'wsgi': self.run_wsgi(wsgi, paths, level, options['wsgi_threads']),
+                        'asgi': asyncio.run(self.run_asgi(asgi, [self.async_path(path) for path in paths], level)),
+                    }
+                    results[name][str(level)] = row
+                    self.stderr.write(
+                        f'{name:<26} x{level:<3}  '
+                        f'wsgi {row["wsgi"]["throughput_rps"]:>7.1f} req/s p95 {row["wsgi"]["p95_ms"]:>8.2f}ms  '
+                        f'asgi {row["asgi"]["throughput_rps"]:>7.1f} req/s p95 {row["asgi"]["p95_ms"]:>8.2f}ms'
+                    )
+
+        report = {
+            'meta': {
+                'database': connection.vendor,
+                'anime': len(self.anime_ids),
+                'requests': options['requests'],
+                'query_latency_ms': options['query_latency'],
+                'wsgi_threads': options['wsgi_threads'],
+                'response_cache': not options['no_cache'],
+            },
+            'endpoints': results,
+        }
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(payload + '\n')
+        else:
+            self.stdout.write(payload)
+
+    def async_path(self, path):
+        return '/api/async/' + path[len('/api/'):]
+
+    def anime_id(self):
+        # Squaring skews picks towards the popular end of the list
+        return self.anime_ids[int(len(self.anime_ids) * self.rng.random() ** 2)]
+
+    def endpoints(self):
+        """(name, factory of a /api/ path that also exists under /api/async/)"""
+        return [
+            ('anime detail', lambda: f'/api/anime/{self.anime_id()}/'),
+            ('search', lambda: f'/api/anime/search/?q={self.rng.choice(self.terms)}'),
+            ('trending', lambda: '/api/anime/trending/'),
+            ('recommendations (similar)', lambda: f'/api/anime/recommendations/?anime_id={self.anime_id()}'),
+            ('comments', lambda: f'/api/anime/{self.anime_id()}/comments/'),
+            ('ratings', lambda: f'/api/anime/{self.anime_id()}/ratings/'),
+        ]
+
+    def summarize(self, timings, statuses, elapsed):
+        return {
+            'throughput_rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'status_codes': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        }
+
+    def run_wsgi(self, application, paths, concurrency, threads):
+        """
+        `concurrency` clients against a server with `threads` threads; requests
+        beyond the thread count wait in the queue, and that wait is timed too
+        """
+        def timed(path, queued_at):
+            status = wsgi_get(application, path)
+            return (time.perf_counter() - queued_at) * 1000, status
+
+        outcomes = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(min(threads or concurrency, concurrency)) as pool:
+            # Each client sends its next request when the previous one is answered
+            pending = [pool.submit(timed, path, time.perf_counter()) for path in paths[:concurrency]]
+            remaining = iter(paths[concurrency:])
+            while pending:
+                outcomes.append(pending.pop(0).result())
+                path = next(remaining, None)
+                if path is not None:
+                    pending.append(pool.submit(timed, path, time.perf_counter()))
+        elapsed = time.perf_counter() - started
+        return self.summarize([ms for ms, _ in outcomes], [status for _, status in outcomes], elapsed)
+
+    async def run_asgi(self, application, paths, concurrency):
+        queue = list(reversed(paths))
+        timings, statuses = [], []
+
+        async def worker():
+            while queue:
+                path = queue.pop()
+                started = time.perf_counter()
+                statuses.append(await asgi_get(application, path))
+                timings.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return self.summarize(timings, statuses, time.perf_counter() - started)
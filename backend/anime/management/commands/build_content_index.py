@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from anime import content
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the content-based neighbours (genres, type, studio, description) of every anime, '
+        'or with --pending only of the anime queued by changes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pending', action='store_true', help='Only refresh the queued anime')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and process the queue every INTERVAL seconds'
+        )
+
+    def handle(self, *args, **options):
+        pending = options['pending']
+        while True:
+            started = time.monotonic()
+            if pending:
+                count = content.process_queue()
+                self.stdout.write(
+                    f'Content neighbours refreshed for {count} queued anime in {time.monotonic() - started:.2f}s'
+                )
+            else:
+                count = content.rebuild()
+                self.stdout.write(self.style.SUCCESS(
+                    f'Content neighbours computed for {count} anime in {time.monotonic() - started:.1f}s'
+                ))
+            if not options['interval']:
+                break
+            pending = True
+            time.sleep(options['interval'])
@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from anime import recommender, search
+from anime.models import Anime, Comment, CommentReport, Genre, Rating
+from users.models import Watchlist
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Fail if any API endpoint issues more queries as its result set grows. '
+        'Fixtures are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=20, help='Rows per relation in the small run')
+        parser.add_argument('--large', type=int, default=60, help='Rows per relation in the large run')
+
+    def handle(self, *args, **options):
+        small = self.measure(options['small'])
+        large = self.measure(options['large'])
+
+        failures = []
+        for name, count in small.items():
+            line = f'{name:<28} {count:>3} queries at {options["small"]}, {large[name]:>3} at {options["large"]}'
+            if large[name] != count:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if failures:
+            raise CommandError(f'Query count grows with result size for: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('Query counts are independent of result size'))
+
+    def measure(self, size):
+        counts = {}
+        # Measure the database work itself, not response cache hits
+        with override_settings(RESPONSE_CACHE_TIMEOUT=0), transaction.atomic():
+            fixture = self.create_fixture(size)
+            for name, path, user in self.endpoints(fixture):
+                # The first request warms up per-process indexes and engines
+                self.get(path, user)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.get(path, user)
+                if response.status_code != 200:
+                    raise CommandError(f'{name}: {path} returned {response.status_code}')
+                counts[name] = len(queries)
+            transaction.set_rollback(True)
+        # The engine was built from rows that no longer exist
+        recommender.reset_engine()
+        return counts
+
+    def get(self, path, user):
+        client = APIClient(SERVER_NAME='localhost')
+        if user is not None:
+            client.force_authenticate(user)
+        return client.get(path)
+
+    def create_fixture(self, size):
+        genres = [
+            Genre.objects.get_or_create(id=f'qc-genre-{index}', defaults={'name': f'QC Genre {index}'})[0]
+            for index in range(3)
+        ]
+        anime = Anime.objects.bulk_create([
+            Anime(title=f'Query Count Show {index}', year=2000 + index % 20, type='TV', rating=index % 10)
+            for index in range(size)
+        ])
+        for item in anime:
+            item.genres.set(genres)
+        # The first user doubles as the admin
+        users = User.objects.bulk_create([
+            User(username=f'qc-user-{index}', email=f'qc-user-{index}@example.com', is_staff=index == 0)
+            for index in range(size)
+        ])
+        target = anime[0]
+        Rating.objects.bulk_create(
+            [Rating(anime=target, user=user, score=1 + index % 10) for index, user in enumerate(users)] +
+            [Rating(anime=item, user=users[0], score=7) for item in anime[1:size // 2]]
+        )
+        comments = Comment.objects.bulk_create([
+            Comment(anime=target, user=user, content='query count') for user in users
+        ])
+        CommentReport.objects.bulk_create([
+            CommentReport(comment=comment, user=user) for comment in comments for user in users[:3]
+        ])
+        Watchlist.objects.bulk_create([Watchlist(user=users[0], anime=item) for item in anime])
+        search.get_backend().index([item.pk for item in anime])
+        return {'anime': target, 'user': users[0], 'admin': users[0], 'anime_ids': [item.pk for item in anime]}
+
+    def endpoints(self, fixture):
+        anime_id = fixture['anime'].pk
+        user = fixture['user']
+        admin = fixture['admin']
+        ids = ','.join(str(pk) for pk in fixture['anime_ids'])
+        endpoints = [
+            ('anime list', '/api/anime/?page_size=100', None),
+            ('anime list (sparse)', '/api/anime/?page_size=100&fields=id,title,image,rating', None),
+            ('anime list (weighted)', '/api/anime/?page_size=100&ordering=-weighted_score', None),
+            ('recommendations (type)', '/api/anime/recommendations/?type=TV', None),
+            ('anime detail', f'/api/anime/{anime_id}/', None),
+            ('genres', '/api/genres/', None),
+            ('search', '/api/anime/search/?q=query&limit=100', None),
+            ('trending', '/api/anime/trending/', None),
+            ('recommendations', '/api/anime/recommendations/', None),
+            ('recommendations (user)', '/api/anime/recommendations/', user),
+            ('recommendations (similar)', f'/api/anime/recommendations/?anime_id={anime_id}', None),
+            ('comments', f'/api/anime/{anime_id}/comments/', None),
+            ('ratings', f'/api/anime/{anime_id}/ratings/', None),
+            ('rating summary', f'/api/anime/{anime_id}/rating-summary/', None),
+            ('watchlist', '/api/auth/watchlist/', user),
+            ('watchlist check (batch)', f'/api/auth/watchlist/check/?ids={ids}', user),
+            ('user ratings (batch)', f'/api/anime/user-ratings/?ids={ids}', user),
+            ('user stats', '/api/auth/user-stats/', user),
+        ]
+        if admin is not None:
+            endpoints += [
+                ('admin users', '/api/auth/admin/users/?page_size=100', admin),
+                ('admin users (by name)', '/api/auth/admin/users/?ordering=username&username=qc-user-1', admin),
+                ('admin users (filtered)', '/api/auth/admin/users/?is_active=true&joined_after=2000-01-01', admin),
+                ('moderation queue', '/api/auth/admin/moderation/', admin),
+            ]
+        return endpoints
@@ -0,0 +1,111 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from anime import recommender
+from anime.management.commands.check_query_counts import Command as QueryCountCommand
+from anime.models import Anime, Comment, Rating, TrendingScore
+from users.models import Watchlist
+
+User = get_user_model()
+
+# Tables that grow with the user base or the catalogue; a full scan of one of
+# these in a request path is a regression
+LARGE_TABLES = {
+    model._meta.db_table
+    for model in (Anime, Anime.genres.through, Rating, Comment, Watchlist, User, TrendingScore)
+}
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)( USING (?:COVERING )?INDEX \w+)?$')
+SQLITE_SORT = re.compile(r'^USE TEMP B-TREE FOR (ORDER|GROUP) BY')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+# Subqueries alias their tables ("anime_anime" U0); plans name the alias
+TABLE_ALIAS = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)\b')
+
+
+class Command(QueryCountCommand):
+    help = (
+        'Run EXPLAIN on every query the API endpoints issue and fail when one of them '
+        'does a full scan of a large table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=60, help='Rows per relation in the fixture')
+        parser.add_argument(
+            '--no-fixture', action='store_true',
+            help='Use the rows already in the database (needed on PostgreSQL, whose plans depend on statistics)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Query plans are not checked on {connection.vendor}')
+
+        failures = []
+        with override_settings(RESPONSE_CACHE_TIMEOUT=0), transaction.atomic():
+            if options['no_fixture']:
+                fixture = self.existing_fixture()
+            else:
+                fixture = self.create_fixture(options['size'])
+            for name, path, user in self.endpoints(fixture):
+                # Warm-up builds per-process indexes; those batch reads are expected to scan
+                self.get(path, user)
+                with CaptureQueriesContext(connection) as queries:
+                    self.get(path, user)
+                for query in queries:
+                    plan = self.explain(query['sql'])
+                    scans = self.full_scans(query['sql'], plan)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{name}: {query["sql"]}\n    ' + '\n    '.join(line for _, line in plan))
+                    if scans:
+                        failures.append(name)
+                        self.stdout.write(self.style.ERROR(
+                            f'{name}: full scan of {", ".join(sorted(scans))}\n  {query["sql"]}'
+                        ))
+            transaction.set_rollback(True)
+        recommender.reset_engine()
+
+        if failures:
+            raise CommandError(f'Full table scans in: {", ".join(sorted(set(failures)))}')
+        self.stdout.write(self.style.SUCCESS('No endpoint scans a large table'))
+
+    def existing_fixture(self):
+        anime = Anime.objects.order_by('-rating_count').first()
+        user = User.objects.annotate(rated=Count('rating')).order_by('-rated').first()
+        if anime is None or user is None:
+            raise CommandError('--no-fixture needs at least one anime and one user')
+        anime_ids = list(Anime.objects.order_by('-rating_count').values_list('pk', flat=True)[:100])
+        admin = User.objects.filter(is_staff=True).first()
+        return {'anime': anime, 'user': user, 'admin': admin, 'anime_ids': anime_ids}
+
+    def explain(self, sql):
+        """Plan lines as (select scope, detail) pairs"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [(parent, detail) for _, parent, _, detail in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN {sql}')
+            return [(0, row[0]) for row in cursor.fetchall()]
+
+    def full_scans(self, sql, plan):
+        if connection.vendor == 'postgresql':
+            tables = {match.group(1) for _, line in plan for match in POSTGRES_SCAN.finditer(line)}
+            return tables & LARGE_TABLES
+        # An index walk only stops early when it delivers the LIMITed rows in
+        # order; if the same select still sorts or groups, every row is read
+        aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+        sorted_scopes = {parent for parent, line in plan if SQLITE_SORT.match(line)}
+        tables = set()
+        for parent, line in plan:
+            match = SQLITE_SCAN.match(line)
+            if not match:
+                continue
+            table = aliases.get(match.group(1), match.group(1))
+            if table not in LARGE_TABLES:
+                continue
+            if not match.group(2) or parent in sorted_scopes or 'LIMIT' not in sql:
+                tables.add(table)
+        return tables
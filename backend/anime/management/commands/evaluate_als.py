@@ -0,0 +1,88 @@
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from anime import als
+from anime.recommender import ItemSimilarityEngine, get_config
+
+
+class Command(BaseCommand):
+    help = (
+        'Hold out a random share of the ratings, train ALS on the rest and report '
+        'RMSE and recall@k on the held-out ratings'
+    )
+
+    def add_arguments(self, parser):
+        config = get_config()
+        parser.add_argument('--test-fraction', type=float, default=0.1)
+        parser.add_argument('--factors', type=int, default=config['ALS_FACTORS'])
+        parser.add_argument('--regularization', type=float, default=config['ALS_REGULARIZATION'])
+        parser.add_argument('--iterations', type=int, default=config['ALS_ITERATIONS'])
+        parser.add_argument('-k', type=int, default=10, help='Cut-off for recall@k')
+        parser.add_argument('--relevant', type=int, default=8, help='Held-out scores counted as relevant')
+        parser.add_argument('--users', type=int, default=1000, help='Users sampled for recall@k')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--compare-item', action='store_true',
+            help='Also report recall@k of the item-item engine trained on the same split'
+        )
+
+    def handle(self, *args, **options):
+        users, items, scores = als.load_ratings()
+        if len(scores) < 10:
+            raise CommandError('Not enough ratings to evaluate')
+        rng = np.random.default_rng(options['seed'])
+        test = rng.random(len(scores)) < options['test_fraction']
+        train = ~test
+
+        started = time.monotonic()
+        model = als.ALSModel.train(
+            users[train], items[train], scores[train],
+            factors=options['factors'],
+            regularization=options['regularization'],
+            iterations=options['iterations'],
+            seed=options['seed'],
+        )
+        self.stdout.write(f'Trained on {train.sum()} ratings in {time.monotonic() - started:.1f}s')
+
+        baseline = float(np.sqrt(np.mean((scores[test] - model.mean) ** 2)))
+        self.stdout.write(f'Held-out ratings:  {test.sum()}')
+        self.stdout.write(f'RMSE (global mean): {baseline:.4f}')
+        self.stdout.write(f'RMSE (ALS):         {model.rmse(users[test], items[test], scores[test]):.4f}')
+
+        history = defaultdict(dict)
+        for user_id, anime_id, score in zip(users[train].tolist(), items[train].tolist(), scores[train].tolist()):
+            history[user_id][anime_id] = score
+        relevant = defaultdict(set)
+        for user_id, anime_id, score in zip(users[test].tolist(), items[test].tolist(), scores[test].tolist()):
+            if score >= options['relevant'] and history[user_id]:
+                relevant[user_id].add(anime_id)
+        if not relevant:
+            self.stdout.write(self.style.WARNING('No held-out relevant ratings to compute recall on'))
+            return
+        sampled = sorted(relevant)
+        if len(sampled) > options['users']:
+            sampled = sorted(rng.choice(sampled, options['users'], replace=False).tolist())
+
+        k = options['k']
+        recall = self.recall(sampled, relevant, lambda user_id: model.recommend(history[user_id], k))
+        self.stdout.write(f'recall@{k} (ALS):       {recall:.4f} over {len(sampled)} users')
+
+        if options['compare_item']:
+            config = get_config()
+            engine = ItemSimilarityEngine(top_k=config['TOP_K'], shrinkage=config['SHRINKAGE']).build(
+                (user_id, anime_id, score)
+                for user_id, scores_by_anime in history.items()
+                for anime_id, score in scores_by_anime.items()
+            )
+            recall = self.recall(sampled, relevant, lambda user_id: engine.recommend_for_user(history[user_id], k))
+            self.stdout.write(f'recall@{k} (item-item): {recall:.4f}')
+
+    def recall(self, sampled, relevant, recommend):
+        total = 0.0
+        for user_id in sampled:
+            recommended = {anime_id for anime_id, _ in recommend(user_id)}
+            total += len(recommended & relevant[user_id]) / len(relevant[user_id])
+        return total / len(sampled)
@@ -0,0 +1,232 @@
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from anime import content, search, trending
+from anime.aggregates import recompute_rating_aggregates
+from anime.ranking import recompute_weighted_scores
+from anime.models import Anime, Comment, Genre, Rating
+from anime.versions import CATALOGUE, COMMENTS, GENRES, RATINGS, bump_version
+from users import activity
+from users.models import Watchlist
+
+User = get_user_model()
+
+SYLLABLES = (
+    'ka', 'ri', 'to', 'ma', 'shi', 'na', 'ro', 'yu', 'ki', 'sa', 'ne', 'ho', 'mi', 'ta', 'ze',
+    'ku', 'ra', 'no', 'hi', 'fu', 'te', 'mo', 'ga', 'ren', 'sei', 'ryu', 'kan', 'tsu', 'do', 'jin',
+)
+
+TYPES = ('TV', 'TV', 'TV', 'Movie', 'OVA', 'Special')
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at values we generate instead of now()"""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a reproducible synthetic dataset (anime, users, power-law distributed ratings, '
+        'comments and watchlists) with bulk inserts, for load testing and benchmarks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anime', type=int, default=50000)
+        parser.add_argument('--users', type=int, default=200000)
+        parser.add_argument('--ratings', type=int, default=10000000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument('--watchlist', type=int, default=500000)
+        parser.add_argument('--days', type=int, default=365, help='Spread activity over this many days')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of anime popularity')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='load', help='Username prefix of the generated users')
+        parser.add_argument('--password', default='loadtest', help='Password shared by the generated users')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days']).total_seconds()
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Users prefixed "{prefix}-" already exist; pick another --prefix')
+
+        started = time.monotonic()
+        self.vocabulary = self.make_vocabulary(2000)
+        self.word_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(self.vocabulary))))
+
+        anime_ids, quality = self.create_anime(options['anime'])
+        user_ids = self.create_users(options['users'], prefix, options['password'])
+
+        # Popularity rank -> anime: weight 1 / rank^skew
+        popular = anime_ids[:]
+        self.rng.shuffle(popular)
+        popularity = list(itertools.accumulate(1 / (rank + 1) ** options['skew'] for rank in range(len(popular))))
+
+        with explicit_timestamps(Rating, Comment):
+            self.create_ratings(options['ratings'], user_ids, popular, popularity, quality)
+            self.create_comments(options['comments'], user_ids, popular, popularity)
+        self.create_watchlist(options['watchlist'], user_ids, popular, popularity)
+
+        # Bulk inserts skip the signal handlers, so derive everything in one pass
+        self.step('Rebuilding derived data')
+        recompute_rating_aggregates(Anime.objects.filter(pk__gte=anime_ids[0]))
+        recompute_weighted_scores()
+        trending.refresh(rebuild=True)
+        search.get_backend().rebuild()
+        content.rebuild()
+        activity.rebuild_all()
+        bump_version(CATALOGUE, GENRES, RATINGS, COMMENTS)
+
+        self.stdout.write(self.style.SUCCESS(f'Load data generated in {time.monotonic() - started:.0f}s'))
+
+    def step(self, message):
+        self.stdout.write(f'{message}...')
+
+    def make_vocabulary(self, size):
+        words = set()
+        while len(words) < size:
+            words.add(''.join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4))))
+        return sorted(words)
+
+    def words(self, count):
+        return self.rng.choices(self.vocabulary, cum_weights=self.word_weights, k=count)
+
+    def timestamp(self):
+        # Skewed towards the present, so the trending windows see steady activity
+        return self.now - timedelta(seconds=self.span * self.rng.random() ** 2)
+
+    def insert(self, model, rows, label, ignore_conflicts=False):
+        """bulk_create an iterable of unsaved rows in batches; returns the number inserted"""
+        inserted = 0
+        rows = iter(rows)
+        with transaction.atomic():
+            while True:
+                batch = list(itertools.islice(rows, self.batch_size))
+                if not batch:
+                    break
+                model.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+                inserted += len(batch)
+                if inserted % (self.batch_size * 20) < self.batch_size:
+                    self.stdout.write(f'  {inserted} {label}')
+        return inserted
+
+    def create_anime(self, count):
+        self.step(f'Creating {count} anime')
+        genres = list(Genre.objects.values_list('id', flat=True))
+        if not genres:
+            Genre.objects.bulk_create([Genre(id=f'genre-{index}', name=f'Genre {index}') for index in range(20)])
+            genres = list(Genre.objects.values_list('id', flat=True))
+        first = (Anime.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        quality = {}
+
+        def rows():
+            for index in range(count):
+                mean = min(max(self.rng.gauss(6.8, 1.0), 2.0), 9.5)
+                quality[first + index] = mean
+                yield Anime(
+                    id=first + index,
+                    title=' '.join(self.words(self.rng.randint(1, 4))).title(),
+                    description=' '.join(self.words(self.rng.randint(25, 80))).capitalize() + '.',
+                    year=self.rng.randint(1970, self.now.year),
+                    type=self.rng.choice(TYPES),
+                    episodes=self.rng.choice((1, 12, 13, 24, 26, 50)),
+                    rating=round(mean, 1),
+                    studio=f'Studio {self.rng.choice(self.vocabulary[:200]).title()}',
+                )
+
+        self.insert(Anime, rows(), 'anime')
+        anime_ids = list(range(first, first + count))
+
+        through = Anime.genres.through
+        links = (
+            through(anime_id=anime_id, genre_id=genre_id)
+            for anime_id in anime_ids
+            for genre_id in self.rng.sample(genres, self.rng.randint(1, min(4, len(genres))))
+        )
+        self.insert(through, links, 'genre links')
+        return anime_ids, quality
+
+    def create_users(self, count, prefix, password):
+        self.step(f'Creating {count} users')
+        # Hashing once keeps this fast; every generated user shares the password
+        hashed = make_password(password)
+        rows = (
+            User(username=f'{prefix}-{index}', email=f'{prefix}-{index}@example.com', password=hashed)
+            for index in range(count)
+        )
+        self.insert(User, rows, 'users')
+        return list(
+            User.objects.filter(username__startswith=f'{prefix}-').order_by('pk').values_list('pk', flat=True)
+        )
+
+    def create_ratings(self, total, user_ids, popular, popularity, quality):
+        self.step(f'Creating ~{total} ratings')
+        # Heavy-tailed activity: a few users rate thousands of titles, most rate a handful
+        activity = [self.rng.paretovariate(1.2) for _ in user_ids]
+        scale = total / sum(activity)
+        cap = max(len(popular) // 4, 1)
+
+        def rows():
+            for user_id, weight in zip(user_ids, activity):
+                wanted = min(max(int(round(weight * scale)), 1), cap)
+                picked = set()
+                for _ in range(5):
+                    picked.update(self.rng.choices(popular, cum_weights=popularity, k=wanted - len(picked)))
+                    if len(picked) >= wanted:
+                        break
+                bias = self.rng.gauss(0, 0.7)
+                for anime_id in picked:
+                    score = round(self.rng.gauss(quality[anime_id] + bias, 1.5))
+                    yield Rating(
+                        anime_id=anime_id, user_id=user_id,
+                        score=min(max(score, 1), 10), created_at=self.timestamp(),
+                    )
+
+        self.insert(Rating, rows(), 'ratings')
+
+    def create_comments(self, total, user_ids, popular, popularity):
+        self.step(f'Creating {total} comments')
+        rows = (
+            Comment(
+                anime_id=anime_id, user_id=self.rng.choice(user_ids),
+                content=' '.join(self.words(self.rng.randint(5, 60))).capitalize() + '.',
+                created_at=self.timestamp(),
+            )
+            for anime_id in self.sample(popular, popularity, total)
+        )
+        self.insert(Comment, rows, 'comments')
+
+    def create_watchlist(self, total, user_ids, popular, popularity):
+        self.step(f'Creating ~{total} watchlist entries')
+        # Duplicate (user, anime) pairs are dropped by ignore_conflicts
+        rows = (
+            Watchlist(user_id=self.rng.choice(user_ids), anime_id=anime_id)
+            for anime_id in self.sample(popular, popularity, total)
+        )
+        self.insert(Watchlist, rows, 'watchlist entries', ignore_conflicts=True)
+
+    def sample(self, population, cum_weights, total):
+        """Stream `total` weighted draws without materialising them all"""
+        while total > 0:
+            count = min(total, self.batch_size)
+            yield from self.rng.choices(population, cum_weights=cum_weights, k=count)
+            total -= count
@@ -0,0 +1,180 @@
+import csv
+import json
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, Round
+from django.utils.text import slugify
+
+from anime import content, ranking, search
+from anime.models import Anime, Genre
+from anime.versions import CATALOGUE, GENRES, bump_version
+
+ANIME_FIELDS = ('title', 'image', 'description', 'year', 'type', 'episodes', 'rating', 'studio')
+REQUIRED_FIELDS = ('title', 'year', 'type')
+# Values for new rows when the file has no such column; existing rows keep theirs
+DEFAULTS = {'image': '', 'description': '', 'episodes': 1, 'rating': 0.0, 'studio': ''}
+
+GENRE_SEPARATORS = re.compile(r'[|;,]')
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a JSON Lines or CSV catalogue and upsert it in batches. Rows need an '
+        '"id", "title", "year" and "type", plus any other Anime fields; "genres" is a list (JSON) '
+        'or a |-separated string (CSV). Columns missing from a row are left unchanged on existing anime.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalogue file (.jsonl or .csv)')
+        parser.add_argument('--format', choices=('jsonl', 'csv'), help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        batch_size = options['batch_size']
+        self.genre_ids = dict(Genre.objects.values_list('name', 'id'))
+        self.new_genres = False
+
+        started = time.monotonic()
+        imported = skipped = 0
+        with open(path, newline='', encoding='utf-8') as handle, transaction.atomic():
+            rows = self.read_csv(handle) if file_format == 'csv' else self.read_jsonl(handle)
+            batch = []
+            for line_number, raw in rows:
+                try:
+                    batch.append(self.clean(raw))
+                except (KeyError, TypeError, ValueError) as error:
+                    skipped += 1
+                    self.stderr.write(f'Skipping row {line_number}: {error!r}')
+                    continue
+                if len(batch) == batch_size:
+                    imported += self.upsert(batch)
+                    batch = []
+                    self.report(imported, started)
+            imported += self.upsert(batch)
+            self.reset_sequences()
+
+        # Incremental for a handful of rows, a full rebuild for a real import
+        if imported > content.INCREMENTAL_LIMIT:
+            content.rebuild()
+        else:
+            content.process_queue()
+        # Detail pages depend on CATALOGUE too, so one bump covers every imported anime
+        bump_version(CATALOGUE, *([GENRES] if self.new_genres else []))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} anime ({skipped} skipped) in {elapsed:.1f}s, '
+            f'{imported / elapsed if elapsed else 0:.0f} rows/s'
+        ))
+
+    def read_jsonl(self, handle):
+        for line_number, line in enumerate(handle, 1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise CommandError(f'Line {line_number} is not valid JSON: {error}')
+
+    def read_csv(self, handle):
+        # Line numbers count the header row
+        for line_number, row in enumerate(csv.DictReader(handle), 2):
+            yield line_number, row
+
+    def clean(self, raw):
+        # A JSON key or CSV cell that is missing altogether (None) is not part
+        # of the row, so the upsert must not overwrite it
+        fields = tuple(field for field in ANIME_FIELDS if field in REQUIRED_FIELDS or raw.get(field) is not None)
+        values = {
+            'id': int(raw['id']),
+            'title': str(raw['title']).strip(),
+            'image': raw.get('image') or DEFAULTS['image'],
+            'description': raw.get('description') or DEFAULTS['description'],
+            'year': int(raw['year']),
+            'type': str(raw['type']).strip(),
+            'episodes': int(raw.get('episodes') or DEFAULTS['episodes']),
+            'rating': float(raw.get('rating') or DEFAULTS['rating']),
+            'studio': raw.get('studio') or DEFAULTS['studio'],
+            'fields': fields,
+        }
+        if not values['title'] or not values['type']:
+            raise ValueError('title and type are required')
+        genres = raw.get('genres')
+        if isinstance(genres, str):
+            genres = GENRE_SEPARATORS.split(genres)
+        # None keeps the existing genre links
+        values['genres'] = None if genres is None else [name.strip() for name in genres if name and name.strip()]
+        return values
+
+    def upsert(self, batch):
+        if not batch:
+            return 0
+        self.create_genres({name for row in batch if row['genres'] for name in row['genres']})
+
+        # One upsert per set of columns (a single one for a CSV file), each
+        # updating only the columns its rows supplied. New titles start at
+        # the prior; existing ones keep their weighted_score
+        prior = ranking.get_prior()
+        groups = {}
+        for row in batch:
+            groups.setdefault(row['fields'], []).append(row)
+        for fields, rows in groups.items():
+            Anime.objects.bulk_create(
+                [
+                    Anime(id=row['id'], weighted_score=prior, **{field: row[field] for field in ANIME_FIELDS})
+                    for row in rows
+                ],
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=list(fields),
+            )
+        anime_ids = [row['id'] for row in batch]
+
+        # Titles that users have rated keep the average of those ratings
+        Anime.objects.filter(pk__in=anime_ids, rating_count__gt=0).update(
+            rating=Round(Cast(F('rating_sum'), FloatField()) / F('rating_count'), 1)
+        )
+
+        # Replace genre links with one delete and one insert on the through table
+        through = Anime.genres.through
+        with_genres = [row for row in batch if row['genres'] is not None]
+        through.objects.filter(anime_id__in=[row['id'] for row in with_genres]).delete()
+        through.objects.bulk_create([
+            through(anime_id=row['id'], genre_id=self.genre_ids[name])
+            for row in with_genres
+            for name in dict.fromkeys(row['genres'])
+        ], ignore_conflicts=True)
+
+        search.get_backend().index(anime_ids)
+        # Queued in the import's transaction, so memory stays bounded by the batch
+        content.enqueue(anime_ids)
+        return len(batch)
+
+    def create_genres(self, names):
+        missing = [name for name in names if name not in self.genre_ids]
+        if not missing:
+            return
+        genres = [Genre(id=slugify(name)[:50] or name[:50], name=name) for name in missing]
+        Genre.objects.bulk_create(genres, ignore_conflicts=True)
+        # A genre may already exist under its slug with a different spelling
+        existing = dict(Genre.objects.filter(id__in=[genre.id for genre in genres]).values_list('id', 'name'))
+        for genre in genres:
+            self.genre_ids[genre.name] = genre.id
+            self.genre_ids.setdefault(existing[genre.id], genre.id)
+        self.new_genres = True
+
+    def reset_sequences(self):
+        # Explicit ids leave PostgreSQL sequences behind; a no-op on SQLite
+        statements = connection.ops.sequence_reset_sql(no_style(), [Anime, Genre])
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def report(self, imported, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'  {imported} rows, {imported / elapsed if elapsed else 0:.0f} rows/s')
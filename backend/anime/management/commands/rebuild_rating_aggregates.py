@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from anime.aggregates import recompute_rating_aggregates
+from anime.ranking import bump_ranking_versions, recompute_weighted_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute Anime.rating_sum, rating_count, the score histogram, rating and weighted_score from the Rating table'
+
+    def handle(self, *args, **options):
+        recompute_rating_aggregates()
+        recompute_weighted_scores()
+        bump_ranking_versions()
+        self.stdout.write(self.style.SUCCESS('Rating aggregates rebuilt'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from anime.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Create and fully rebuild the anime full-text search index'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.install()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt ({type(backend).__name__})'))
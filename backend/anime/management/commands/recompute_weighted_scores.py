@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from anime.ranking import bump_ranking_versions, recompute_weighted_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the catalogue-wide prior in one aggregate and rewrite Anime.weighted_score '
+        'for every anime with a single UPDATE'
+    )
+
+    def handle(self, *args, **options):
+        prior = recompute_weighted_scores()
+        bump_ranking_versions()
+        self.stdout.write(self.style.SUCCESS(f'Weighted scores recomputed against a prior of {prior:.3f}'))
@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from anime import als, materialized, recommender
+from anime.models import Rating, RecommendationRefresh
+
+
+def compute_chunk(user_ids):
+    # Runs in a pool worker; forked workers share the parent's engine or mapped factors
+    return materialized.compute(user_ids)
+
+
+def close_connections():
+    # Database connections must not be shared across a fork
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute collaborative recommendations for users with a pending refresh '
+        '(or for everyone with --all) in a pool of worker processes sharded by user id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refresh every user who has rated something')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=200, help='Users per task')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and process the queue every INTERVAL seconds'
+        )
+
+    def handle(self, *args, **options):
+        refresh_all = options['all']
+        while True:
+            started = time.monotonic()
+            refreshed = self.refresh(refresh_all, options['workers'], options['chunk_size'])
+            self.stdout.write(
+                f'Recommendations refreshed for {refreshed} users in {time.monotonic() - started:.2f}s'
+            )
+            if not options['interval']:
+                break
+            refresh_all = False
+            time.sleep(options['interval'])
+
+    def refresh(self, refresh_all, workers, chunk_size):
+        computed_at = timezone.now()
+        if refresh_all:
+            users = Rating.objects.values_list('user_id', flat=True).distinct()
+        else:
+            users = RecommendationRefresh.objects.filter(requested_at__lte=computed_at).values_list('user_id', flat=True)
+        user_ids = sorted(users)
+        if not user_ids:
+            return 0
+
+        # Load the model once, before forking, from the ratings as they are now
+        if recommender.get_config()['ENGINE'] != 'als' or als.get_model() is None:
+            recommender.build_engine()
+
+        # Shard by user id so each worker reads a disjoint slice of the ratings
+        shards = [user_ids[shard::workers] for shard in range(workers)]
+        chunks = [
+            shard[start:start + chunk_size]
+            for shard in shards
+            for start in range(0, len(shard), chunk_size)
+        ]
+
+        refreshed = 0
+        if workers > 1 and len(chunks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            close_connections()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(workers, initializer=close_connections) as pool:
+                # Results are written here, one transaction per chunk, so
+                # the workers never contend for database write locks
+                for results in pool.imap_unordered(compute_chunk, chunks):
+                    materialized.store(results, computed_at)
+                    refreshed += len(results)
+        else:
+            for chunk in chunks:
+                results = compute_chunk(chunk)
+                materialized.store(results, computed_at)
+                refreshed += len(results)
+        return refreshed
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from anime import trending
+
+
+class Command(BaseCommand):
+    help = 'Decay the trending leaderboard and add ratings and comments created since the last refresh'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every score from the full history')
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and refresh every INTERVAL seconds'
+        )
+
+    def handle(self, *args, **options):
+        rebuild = options['rebuild']
+        while True:
+            started = time.monotonic()
+            events = trending.refresh(rebuild=rebuild)
+            self.stdout.write(
+                f'Trending refreshed: {events} new events in {time.monotonic() - started:.2f}s'
+            )
+            if not options['interval']:
+                break
+            rebuild = False
+            time.sleep(options['interval'])
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from anime import als
+from anime.recommender import get_config
+
+
+class Command(BaseCommand):
+    help = 'Train the ALS matrix factorisation model on every rating and save its factors'
+
+    def add_arguments(self, parser):
+        config = get_config()
+        parser.add_argument('--factors', type=int, default=config['ALS_FACTORS'])
+        parser.add_argument('--regularization', type=float, default=config['ALS_REGULARIZATION'])
+        parser.add_argument('--iterations', type=int, default=config['ALS_ITERATIONS'])
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default=config['ALS_PATH'], help="Defaults to RECOMMENDER['ALS_PATH']")
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError("Set RECOMMENDER['ALS_PATH'] or pass --output")
+
+        started = time.monotonic()
+        users, items, scores = als.load_ratings()
+        if not len(scores):
+            raise CommandError('There are no ratings to train on')
+        self.stdout.write(f'Loaded {len(scores)} ratings in {time.monotonic() - started:.1f}s')
+
+        def report(iteration, rmse):
+            self.stdout.write(
+                f'  iteration {iteration + 1}: training RMSE {rmse:.4f} ({time.monotonic() - started:.1f}s)'
+            )
+
+        model = als.ALSModel.train(
+            users, items, scores,
+            factors=options['factors'],
+            regularization=options['regularization'],
+            iterations=options['iterations'],
+            seed=options['seed'],
+            callback=report,
+        )
+        model.save(
+            options['output'],
+            factors=options['factors'],
+            iterations=options['iterations'],
+            ratings=int(len(scores)),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {len(model.user_ids)} user and {len(model.anime_ids)} anime factors '
+            f'to {options["output"]} in {time.monotonic() - started:.1f}s'
+        ))
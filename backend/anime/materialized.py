@@ -0,0 +1,95 @@
+"""
+Precomputed per-user recommendations.
+
+Scoring a user against the item-item engine costs time proportional to
+their rating history, so the heaviest raters set the tail latency of the
+recommendations endpoint. The refresh_recommendations worker stores each
+user's collaborative candidates in UserRecommendation; the view reads them
+with one query while they are fresh and recomputes live otherwise.
+
+Rows are fresh when they are younger than MATERIALIZED_MAX_AGE and the user
+has no pending RecommendationRefresh, which every rating write enqueues. A
+UserRecommendationSet row records each computation, so a user the engine had
+nothing for reads as fresh and empty rather than as never computed.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Rating, RecommendationRefresh, UserRecommendation, UserRecommendationSet
+from .recommender import get_config, recommend_for_user
+
+
+def enqueue(user_id):
+    """Mark a user's stored recommendations as stale, in one upsert"""
+    try:
+        RecommendationRefresh.objects.bulk_create(
+            [RecommendationRefresh(user_id=user_id, requested_at=timezone.now())],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['requested_at'],
+        )
+    except IntegrityError:
+        # The ratings went with a deleted user
+        pass
+
+
+def fresh_scores(user_id):
+    """{anime_id: score} from the stored rows, possibly empty, or None when they are missing or stale"""
+    cutoff = timezone.now() - timedelta(seconds=get_config()['MATERIALIZED_MAX_AGE'])
+    pending = RecommendationRefresh.objects.filter(user_id=OuterRef('user_id'))
+    rows = (
+        UserRecommendation.objects
+        .filter(user_id=user_id, computed_at__gte=cutoff)
+        .filter(~Exists(pending))
+        .order_by('rank')
+        .values_list('anime_id', 'score')
+    )
+    scores = dict(rows)
+    if scores:
+        return scores
+    # No rows: an empty result if the last computation is fresh, else unknown
+    computed = (
+        UserRecommendationSet.objects
+        .filter(user_id=user_id, computed_at__gte=cutoff)
+        .filter(~Exists(pending))
+        .exists()
+    )
+    return {} if computed else None
+
+
+def compute(user_ids):
+    """{user_id: [(anime_id, score), ...]} from the collaborative engine"""
+    limit = get_config()['CANDIDATES']
+    history = {user_id: {} for user_id in user_ids}
+    for user_id, anime_id, score in Rating.objects.filter(user_id__in=user_ids).values_list(
+        'user_id', 'anime_id', 'score'
+    ):
+        history[user_id][anime_id] = score
+    return {
+        user_id: recommend_for_user(scores, limit=limit)
+        for user_id, scores in history.items()
+    }
+
+
+def store(results, computed_at):
+    """Replace the stored rows of every user in `results` and clear their queue entries"""
+    user_ids = list(results)
+    with transaction.atomic():
+        UserRecommendation.objects.filter(user_id__in=user_ids).delete()
+        UserRecommendation.objects.bulk_create([
+            UserRecommendation(user_id=user_id, anime_id=anime_id, score=score, rank=rank, computed_at=computed_at)
+            for user_id, recommendations in results.items()
+            for rank, (anime_id, score) in enumerate(recommendations, 1)
+        ], batch_size=1000)
+        UserRecommendationSet.objects.bulk_create(
+            [UserRecommendationSet(user_id=user_id, computed_at=computed_at) for user_id in user_ids],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['computed_at'],
+            batch_size=1000,
+        )
+        # Ratings written after the computation started stay queued
+        RecommendationRefresh.objects.filter(user_id__in=user_ids, requested_at__lte=computed_at).delete()
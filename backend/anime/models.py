@@ -26,15 +26,41 @@ class Anime(models.Model):
     rating = models.FloatField(default=0.0)
     genres = models.ManyToManyField(Genre, related_name='anime')
     studio = models.CharField(max_length=100, blank=True)
+    # Running totals over this anime's ratings, maintained by anime.aggregates
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_count = models.IntegerField(default=0, editable=False)
+    # Bayesian average of the user ratings, maintained by anime.aggregates (see anime.ranking)
+    weighted_score = models.FloatField(default=0.0, editable=False)
+    # Ratings per score, the histogram of the rating summary
+    score_count_1 = models.IntegerField(default=0, editable=False)
+    score_count_2 = models.IntegerField(default=0, editable=False)
+    score_count_3 = models.IntegerField(default=0, editable=False)
+    score_count_4 = models.IntegerField(default=0, editable=False)
+    score_count_5 = models.IntegerField(default=0, editable=False)
+    score_count_6 = models.IntegerField(default=0, editable=False)
+    score_count_7 = models.IntegerField(default=0, editable=False)
+    score_count_8 = models.IntegerField(default=0, editable=False)
+    score_count_9 = models.IntegerField(default=0, editable=False)
+    score_count_10 = models.IntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Keyset orderings of the list endpoint, ending in id
+            models.Index(fields=['-rating', '-id'], name='anime_rating_idx'),
+            models.Index(fields=['-year', '-id'], name='anime_year_idx'),
+            models.Index(fields=['-weighted_score', '-id'], name='anime_weighted_idx'),
+            models.Index(fields=['type', '-weighted_score'], name='anime_type_weighted_idx'),
+            models.Index(fields=['title'], name='anime_title_idx'),
+            models.Index(fields=['-rating_count', '-weighted_score'], name='anime_popularity_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
     @property
     def average_rating(self):
-        ratings = Rating.objects.filter(anime=self)
-        if ratings.exists():
-            return sum(r.score for r in ratings) / ratings.count()
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
         return 0
 
 class Rating(models.Model):
@@ -45,9 +71,22 @@ class Rating(models.Model):
     
     class Meta:
         unique_together = ('anime', 'user')
+        indexes = [
+            models.Index(fields=['anime', '-created_at'], name='rating_anime_recent_idx'),
+            models.Index(fields=['user', 'score'], name='rating_user_score_idx'),
+            models.Index(fields=['anime', 'score'], name='rating_anime_score_idx'),
+            models.Index(fields=['created_at'], name='rating_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.anime.title} - {self.score}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored score so signal handlers can apply deltas
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
 
 class Comment(models.Model):
     anime = models.ForeignKey(Anime, on_delete=models.CASCADE, related_name='comments')
@@ -55,5 +94,129 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['anime', '-created_at'], name='comment_anime_recent_idx'),
+            models.Index(fields=['created_at'], name='comment_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} on {self.anime.title}"
+
+class CommentReport(models.Model):
+    """One user's report of a comment; resolved when a moderator approves or removes it"""
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='reports')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    reason = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('comment', 'user')
+        indexes = [
+            # The moderation queue only ever reads open reports
+            models.Index(
+                fields=['comment', 'created_at'], name='report_open_idx',
+                condition=models.Q(resolved_at__isnull=True)
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} reported comment {self.comment_id}"
+
+class TrendingScore(models.Model):
+    """Precomputed, time-decayed activity per anime, refreshed by anime.trending"""
+    anime = models.OneToOneField(Anime, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score_24h = models.FloatField(default=0.0)
+    score_7d = models.FloatField(default=0.0)
+    activity = models.IntegerField(default=0)
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score_24h'], name='trending_24h_idx'),
+            models.Index(fields=['-score_7d'], name='trending_7d_idx'),
+            models.Index(fields=['-activity'], name='trending_all_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.anime_id}: {self.score_24h:.2f} / {self.score_7d:.2f} / {self.activity}"
+
+class TrendingWatermark(models.Model):
+    """Highest Rating or Comment id the trending leaderboard has counted"""
+    source = models.CharField(max_length=20, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.source} <= {self.last_id}"
+
+class ContentRefresh(models.Model):
+    """Queue of anime whose content neighbours are out of date, drained by anime.content"""
+    # Not a foreign key: a deleted anime stays queued so its neighbours are fixed
+    anime_id = models.BigIntegerField(primary_key=True)
+    requested_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.anime_id} since {self.requested_at}"
+
+class SimilarAnime(models.Model):
+    """Top-K content neighbours of an anime, computed by anime.content"""
+    anime = models.ForeignKey(Anime, on_delete=models.CASCADE, related_name='similar')
+    similar = models.ForeignKey(Anime, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ('anime', 'similar')
+        indexes = [
+            models.Index(fields=['anime', 'rank'], name='similar_anime_rank_idx'),
+            models.Index(fields=['similar'], name='similar_anime_similar_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.anime_id} ~ {self.similar_id} ({self.score:.2f})"
+
+class UserRecommendation(models.Model):
+    """A user's precomputed collaborative recommendations, filled by anime.materialized"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recommendations')
+    anime = models.ForeignKey(Anime, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('user', 'anime')
+        indexes = [
+            models.Index(fields=['user', 'rank'], name='user_recommendation_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} #{self.rank}: {self.anime_id} ({self.score:.2f})"
+
+class UserRecommendationSet(models.Model):
+    """When a user's UserRecommendation rows were computed, kept even when there are none"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+'
+    )
+    computed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.user_id} at {self.computed_at}"
+
+class RecommendationRefresh(models.Model):
+    """Queue of users whose precomputed recommendations are out of date"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+'
+    )
+    requested_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.user_id} since {self.requested_at}"
+
+class RankingPrior(models.Model):
+    """The single catalogue-wide prior weighted_score is computed against, written by anime.ranking"""
+    mean = models.FloatField()
+    computed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.mean:.3f} at {self.computed_at}"
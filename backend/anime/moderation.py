@@ -0,0 +1,80 @@
+"""
+Comment reports and bulk moderation.
+
+Users report comments; each open report is a CommentReport row with no
+`resolved_at`. The moderation queue groups open reports by comment, most
+reported first, reading only the partial index over open reports.
+
+Moderators approve or remove comments by the thousand, in one transaction
+of set-based statements: approving closes the comments' open reports with
+one UPDATE, and removing deletes the comments and their reports through
+QuerySet.delete(), which reads and deletes them in batches.
+Removal mutes Comment's per-row delete receivers, so it adjusts the authors'
+activity counters and bumps the cache versions of the affected anime itself.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from users.models import UserActivityStats
+
+from .models import Comment, CommentReport
+from .signals import bulk_comment_delete, bump_on_commit
+from .versions import COMMENTS, anime_comments_version, anime_version
+
+# Comment ids accepted per moderation request
+MAX_BULK_IDS = 5000
+
+
+def report(comment, user, reason=''):
+    """Record `user`'s report of `comment`; returns (report, created)"""
+    return CommentReport.objects.get_or_create(comment=comment, user=user, defaults={'reason': reason})
+
+
+def queue():
+    """Open reports grouped by comment: dicts of comment, report_count and first_reported_at"""
+    return CommentReport.objects.filter(resolved_at__isnull=True).values('comment').annotate(
+        report_count=Count('id'),
+        first_reported_at=Min('created_at'),
+    )
+
+
+def approve(comment_ids):
+    """Keep the comments and close their open reports; returns the number of reports closed"""
+    with transaction.atomic():
+        return CommentReport.objects.filter(comment_id__in=comment_ids, resolved_at__isnull=True).update(
+            resolved_at=timezone.now()
+        )
+
+
+def remove(comment_ids):
+    """Delete the comments and their reports; returns the number of comments deleted"""
+    with transaction.atomic():
+        comments = Comment.objects.filter(pk__in=comment_ids)
+        rows = list(comments.values_list('anime_id', 'user_id'))
+        if not rows:
+            return 0
+
+        # One UPDATE per distinct number of comments removed from an author
+        removed_by_user = Counter(user_id for _, user_id in rows)
+        users_by_count = {}
+        for user_id, count in removed_by_user.items():
+            users_by_count.setdefault(count, []).append(user_id)
+        for count, user_ids in users_by_count.items():
+            UserActivityStats.objects.filter(pk__in=user_ids).update(comment_count=F('comment_count') - count)
+
+        # Reports cascade in batched DELETEs. The per-comment delete signals
+        # are muted on purpose: the counters were adjusted above and the
+        # versions are bumped below, once for the whole set
+        with bulk_comment_delete():
+            comments.delete()
+
+        anime_ids = {anime_id for anime_id, _ in rows}
+        bump_on_commit(
+            COMMENTS,
+            *[anime_version(anime_id) for anime_id in anime_ids],
+            *[anime_comments_version(anime_id) for anime_id in anime_ids],
+        )
+    return len(rows)
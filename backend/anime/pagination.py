@@ -0,0 +1,179 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are selected with a WHERE on the full ordering key rather than an
+OFFSET, so fetching page 1000 costs the same as page 1 and the cursor stays
+stable while rows are inserted. The cursor is the ordering name plus the key
+of the last row served, encoded as URL-safe base64 JSON.
+"""
+import base64
+import datetime
+import json
+import operator
+from functools import reduce
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder drops microseconds past the millisecond, which would
+    # make a timestamp cursor skip or repeat rows created in the same millisecond
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    # Named orderings; each must end with a unique field so keys never tie
+    orderings = {}
+    default_ordering = None
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views"""
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_name, cursor_key = self.decode_cursor(request)
+        self.ordering = self.orderings[self.ordering_name]
+
+        queryset = queryset.order_by(*self.ordering)
+        if cursor_key is not None:
+            queryset = queryset.filter(self.after(cursor_key))
+
+        # One extra row tells us whether there is a next page
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering_name(self, request):
+        name = request.query_params.get(self.ordering_query_param)
+        return name if name in self.orderings else self.default_ordering
+
+    def after(self, key):
+        """
+        Rows strictly after `key` in the current ordering:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        clauses = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {f.lstrip('-'): key[i] for i, f in enumerate(self.ordering[:index])}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': key[index]}))
+        return reduce(operator.or_, clauses)
+
+    def row_key(self, row):
+        # Rows are model instances, or dicts from a .values() projection
+        if isinstance(row, dict):
+            return [row[field.lstrip('-')] for field in self.ordering]
+        return [getattr(row, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, key):
+        payload = json.dumps({'o': self.ordering_name, 'k': key}, cls=CursorEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return self.get_ordering_name(request), None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            name, key = payload['o'], payload['k']
+            if name not in self.orderings or len(key) != len(self.orderings[name]):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return name, key
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.ordering_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.row_key(self.page[-1])))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class AnimeCursorPagination(KeysetPagination):
+    orderings = {
+        '-rating': ('-rating', '-id'),
+        'rating': ('rating', 'id'),
+        '-year': ('-year', '-id'),
+        'year': ('year', 'id'),
+        '-weighted_score': ('-weighted_score', '-id'),
+        'weighted_score': ('weighted_score', 'id'),
+    }
+    default_ordering = '-rating'
+
+
+class CreatedAtCursorPagination(KeysetPagination):
+    page_size = 20
+    orderings = {
+        '-created_at': ('-created_at', '-id'),
+        'created_at': ('created_at', 'id'),
+    }
+    default_ordering = '-created_at'
+
+
+class UserCursorPagination(KeysetPagination):
+    page_size = 50
+    max_page_size = 500
+    orderings = {
+        '-date_joined': ('-date_joined', '-id'),
+        'date_joined': ('date_joined', 'id'),
+        'username': ('username', 'id'),
+    }
+    default_ordering = '-date_joined'
+
+
+class ReportQueuePagination(KeysetPagination):
+    page_size = 50
+    orderings = {
+        '-report_count': ('-report_count', '-comment'),
+        'first_reported_at': ('first_reported_at', 'comment'),
+    }
+    default_ordering = '-report_count'
@@ -0,0 +1,297 @@
+"""
+Staged hybrid recommendation pipeline.
+
+A request runs through four stages:
+
+1. Candidate generation. Every source in SOURCES proposes at most
+   CANDIDATES anime with a source-specific score: collaborative predictions
+   for the user, collaborative neighbours of the source anime, stored content
+   neighbours (of the source anime or of the user's favourite titles), top
+   weighted anime of the user's favourite genres, and popular anime from the
+   cold-start pools (anime.coldstart).
+2. Filtering. The source anime and anime the user has rated or saved are
+   dropped, then the survivors are narrowed to the requested genres and type
+   in one query that reads only their ids and weighted scores.
+3. Scoring. Each source's scores are scaled to [0, 1] and combined with the
+   HYBRID_WEIGHTS of the recommender config, plus a small quality term from
+   the Bayesian weighted score (anime.ranking).
+4. Re-ranking. Maximal marginal relevance trades score against genre
+   overlap with the anime already picked, weighted by DIVERSITY. Only the
+   final page of anime is loaded in full.
+
+Every stage is timed; the view reports the timings in a Server-Timing header.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from users import watchlist_cache
+from users.models import UserProfile, Watchlist
+
+from . import coldstart, materialized
+from .models import Anime, Rating, SimilarAnime
+from .recommender import SCALE_MIDPOINT, get_config, get_engine, recommend_for_user
+
+# Ratings at or above this make an anime seed the user's content candidates
+SEED_MIN_SCORE = 7
+MAX_SEEDS = 10
+
+# Scored candidates handed to the re-ranker per result slot
+RERANK_POOL = 3
+
+# Below MIN_RESULTS, up to FALLBACK_SIZE cold-start picks are added
+MIN_RESULTS = 5
+FALLBACK_SIZE = 10
+
+
+class Timings:
+    """Wall-clock milliseconds per named stage"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def header(self):
+        """Server-Timing header value"""
+        return ', '.join(f'{name};dur={elapsed:.2f}' for name, elapsed in self.stages.items())
+
+
+def collaborative_candidates(pipeline, limit):
+    """The user's precomputed predictions while fresh, else live ones"""
+    if pipeline.user_id is None:
+        return {}
+    scores = materialized.fresh_scores(pipeline.user_id)
+    if scores is None:
+        scores = dict(recommend_for_user(pipeline.user_scores, limit=limit))
+    return dict(list(scores.items())[:limit])
+
+
+def similar_candidates(pipeline, limit):
+    """Collaborative neighbours of the source anime"""
+    if pipeline.anime_id is None:
+        return {}
+    return dict(get_engine().similar_items(pipeline.anime_id, limit=limit))
+
+
+def content_candidates(pipeline, limit):
+    """Stored content neighbours of the source anime, or of the user's best rated anime"""
+    if pipeline.anime_id is not None:
+        seeds = {pipeline.anime_id: 1.0}
+    else:
+        best = sorted(
+            (item for item in pipeline.user_scores.items() if item[1] >= SEED_MIN_SCORE),
+            key=lambda item: -item[1],
+        )[:MAX_SEEDS]
+        seeds = {anime_id: (score - SCALE_MIDPOINT) / (10 - SCALE_MIDPOINT) for anime_id, score in best}
+    if not seeds:
+        return {}
+    scores = {}
+    for anime_id, similar_id, score in SimilarAnime.objects.filter(anime_id__in=list(seeds)).values_list(
+        'anime_id', 'similar_id', 'score'
+    ):
+        scores[similar_id] = max(scores.get(similar_id, 0.0), score * seeds[anime_id])
+    return dict(sorted(scores.items(), key=lambda item: -item[1])[:limit])
+
+
+def genre_candidates(pipeline, limit):
+    """Best weighted anime in the user's favourite genres, or in the source anime's"""
+    if pipeline.anime_id is not None:
+        genre_ids = Anime.genres.through.objects.filter(anime_id=pipeline.anime_id).values('genre_id')
+    elif pipeline.user_id is not None:
+        genre_ids = UserProfile.favorite_genres.through.objects.filter(
+            userprofile__user_id=pipeline.user_id
+        ).values('genre_id')
+    else:
+        return {}
+    anime_ids = (
+        Anime.objects.filter(genres__in=genre_ids).distinct()
+        .order_by('-weighted_score', '-id').values_list('pk', flat=True)[:limit]
+    )
+    return {anime_id: 1 - rank / limit for rank, anime_id in enumerate(anime_ids)}
+
+
+def popular_candidates(pipeline, limit):
+    """The best anime of the in-memory cold-start pool, weighing rating and rating count"""
+    anime_ids = coldstart.get_pools().top(limit)
+    return {anime_id: 1 - rank / limit for rank, anime_id in enumerate(anime_ids)}
+
+
+# Candidate sources by name; HYBRID_WEIGHTS gives each one its weight
+SOURCES = {
+    'collaborative': collaborative_candidates,
+    'similar': similar_candidates,
+    'content': content_candidates,
+    'genres': genre_candidates,
+    'popular': popular_candidates,
+}
+
+
+def genre_overlap(first, second):
+    """Jaccard similarity of two genre id sets"""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class RecommendationPipeline:
+    def __init__(self, user_id=None, anime_id=None, genres=(), anime_type='', limit=15):
+        self.user_id = user_id
+        self.anime_id = anime_id
+        self.genres = list(genres)
+        self.anime_type = anime_type
+        self.limit = limit
+        self.config = get_config()
+        self.timings = Timings()
+        self._user_scores = None
+
+    @property
+    def user_scores(self):
+        """{anime_id: score} of everything the user has rated, loaded once"""
+        if self._user_scores is None:
+            self._user_scores = {}
+            if self.user_id is not None:
+                with self.timings.stage('history'):
+                    self._user_scores = dict(
+                        Rating.objects.filter(user_id=self.user_id).values_list('anime_id', 'score')
+                    )
+        return self._user_scores
+
+    def run(self):
+        """Recommended Anime instances, best first, with their genres prefetched"""
+        candidates = {}
+        for name, source in SOURCES.items():
+            if not self.config['HYBRID_WEIGHTS'].get(name):
+                continue
+            with self.timings.stage(f'candidates-{name}'):
+                scores = source(self, self.config['CANDIDATES'])
+            if scores:
+                candidates[name] = scores
+
+        with self.timings.stage('filter'):
+            quality = self.filter(candidates)
+        with self.timings.stage('score'):
+            scored = self.score(quality, candidates)
+        with self.timings.stage('rerank'):
+            anime_ids = self.rerank(scored)
+        with self.timings.stage('load'):
+            anime = Anime.objects.filter(pk__in=anime_ids).prefetch_related('genres').in_bulk()
+            results = [anime[pk] for pk in anime_ids if pk in anime]
+
+        if len(results) < self.limit:
+            with self.timings.stage('fill'):
+                results += self.fill(results)
+
+        # If we have too few results, add popular picks from the cold-start pools
+        if len(results) < MIN_RESULTS:
+            with self.timings.stage('fallback'):
+                results += self.fallback(results)
+        return results
+
+    def excluded(self):
+        """The source anime and everything the user has rated"""
+        excluded = set(self.user_scores)
+        if self.anime_id is not None:
+            excluded.add(self.anime_id)
+        return excluded
+
+    def saved(self, anime_ids):
+        """The subset of `anime_ids` on the user's watchlist"""
+        if self.user_id is None or not anime_ids:
+            return set()
+        if getattr(settings, 'WATCHLIST_MEMBERSHIP_CACHE', False):
+            bits = watchlist_cache.membership(self.user_id)
+            return {pk for pk in anime_ids if watchlist_cache.contains(bits, pk)}
+        return set(
+            Watchlist.objects.filter(user_id=self.user_id, anime_id__in=list(anime_ids))
+            .values_list('anime_id', flat=True)
+        )
+
+    def queryset(self):
+        """Anime matching the requested genres and type"""
+        queryset = Anime.objects.all()
+        if self.genres:
+            queryset = queryset.filter(genres__id__in=self.genres).distinct()
+        if self.anime_type:
+            queryset = queryset.filter(type=self.anime_type)
+        return queryset
+
+    def filter(self, candidates):
+        """{anime_id: weighted_score} of the candidates that pass every filter"""
+        anime_ids = set().union(*candidates.values()) - self.excluded()
+        anime_ids -= self.saved(anime_ids)
+        if not anime_ids:
+            return {}
+        # Only the columns scoring needs; the final page is loaded in full later
+        return dict(self.queryset().filter(pk__in=list(anime_ids)).values_list('pk', 'weighted_score'))
+
+    def score(self, quality, candidates):
+        """(score, anime_id) pairs, best first"""
+        weights = self.config['HYBRID_WEIGHTS']
+        scales = {
+            name: max(scores.values()) or 1.0
+            for name, scores in candidates.items()
+        }
+        scored = []
+        for anime_id, weighted in quality.items():
+            score = weights.get('quality', 0) * weighted / 10
+            for name, scores in candidates.items():
+                if anime_id in scores:
+                    score += weights[name] * max(scores[anime_id], 0) / scales[name]
+            scored.append((score, anime_id))
+        scored.sort(key=lambda pair: (-pair[0], -quality[pair[1]], pair[1]))
+        return scored
+
+    def rerank(self, scored):
+        """Anime ids picked by greedy maximal marginal relevance over the best scored candidates"""
+        diversity = self.config['DIVERSITY']
+        pool = scored[:self.limit * RERANK_POOL]
+        if not pool:
+            return []
+        top = pool[0][0] or 1.0
+        genres = {anime_id: set() for _, anime_id in pool}
+        for anime_id, genre_id in Anime.genres.through.objects.filter(anime_id__in=list(genres)).values_list(
+            'anime_id', 'genre_id'
+        ):
+            genres[anime_id].add(genre_id)
+
+        relevance = {anime_id: (1 - diversity) * score / top for score, anime_id in pool}
+        # Highest genre overlap of each remaining candidate with the picks so far
+        overlap = dict.fromkeys(relevance, 0.0)
+        picked = []
+        while overlap and len(picked) < self.limit:
+            best = max(overlap, key=lambda anime_id: relevance[anime_id] - diversity * overlap[anime_id])
+            del overlap[best]
+            picked.append(best)
+            for anime_id in overlap:
+                overlap[anime_id] = max(overlap[anime_id], genre_overlap(genres[anime_id], genres[best]))
+        return picked
+
+    def fallback(self, results):
+        """A weighted sample of popular anime matching the filters, unseen by the user"""
+        exclude = self.excluded() | {anime.pk for anime in results}
+        anime_ids = coldstart.sample(FALLBACK_SIZE * 2, self.genres, self.anime_type, exclude)
+        saved = self.saved(anime_ids)
+        anime_ids = [pk for pk in anime_ids if pk not in saved][:FALLBACK_SIZE]
+        anime = Anime.objects.filter(pk__in=anime_ids).prefetch_related('genres').in_bulk()
+        return [anime[pk] for pk in anime_ids if pk in anime]
+
+    def fill(self, results):
+        """Best weighted anime for the slots the candidates could not fill"""
+        excluded = self.excluded() | {anime.pk for anime in results}
+        needed = self.limit - len(results)
+        # Over-fetch so that anime on the watchlist can be dropped afterwards
+        anime = list(
+            self.queryset().exclude(pk__in=list(excluded))
+            .order_by('-weighted_score', '-id').prefetch_related('genres')[:needed * 2]
+        )
+        saved = self.saved({item.pk for item in anime})
+        return [item for item in anime if item.pk not in saved][:needed]
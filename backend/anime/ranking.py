@@ -0,0 +1,141 @@
+"""
+Rating summaries and the Bayesian-weighted score used for ranking.
+
+Everything is derived from the denormalized counters on Anime (the rating
+sum, count and per-score histogram kept by anime.aggregates), so a summary
+costs one primary-key read however many users rated the anime.
+
+The weighted score shrinks an anime's mean towards the catalogue-wide mean,
+IMDB style:
+
+    weighted_score = (PRIOR_WEIGHT * prior + rating_sum) / (PRIOR_WEIGHT + rating_count)
+
+so a title with one perfect score does not outrank one with thousands of
+nines. It is stored, indexed, on Anime and adjusted by every rating write.
+The prior is fixed between runs of `recompute_weighted_scores`, which
+aggregates it once, stores it in the one-row RankingPrior table and rewrites
+every row with a single UPDATE. Every process reads it from that table, so
+incremental updates and the bulk rewrite weigh rows against the same prior.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Sum, Value
+from django.utils import timezone
+
+from .models import Anime, RankingPrior
+from .versions import CATALOGUE, RANKING, RATINGS, bump_version
+
+DEFAULTS = {
+    # Ratings' worth of the catalogue mean mixed into every weighted score
+    'PRIOR_WEIGHT': 25,
+    # Mean used before anything has been rated
+    'DEFAULT_PRIOR_MEAN': 5.5,
+}
+
+# Primary key of the RankingPrior row
+PRIOR_ID = 1
+
+SCORES = range(1, 11)
+
+
+def histogram_field(score):
+    return f'score_count_{score}'
+
+
+HISTOGRAM_FIELDS = [histogram_field(score) for score in SCORES]
+
+# The Anime columns a rating summary reads
+SUMMARY_FIELDS = ('id', 'rating_sum', 'rating_count', 'weighted_score', *HISTOGRAM_FIELDS)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'RANKING', {}))
+    return config
+
+
+def compute_prior():
+    """Mean of every user rating, from the per-anime totals in one aggregate"""
+    totals = Anime.objects.aggregate(total=Sum('rating_sum'), count=Sum('rating_count'))
+    if not totals['count']:
+        return get_config()['DEFAULT_PRIOR_MEAN']
+    return totals['total'] / totals['count']
+
+
+def get_prior():
+    """The prior of the last recompute, aggregated and stored on first use"""
+    prior = RankingPrior.objects.filter(pk=PRIOR_ID).values_list('mean', flat=True).first()
+    if prior is None:
+        # get_or_create() so that concurrent first readers agree on one value
+        row, _ = RankingPrior.objects.get_or_create(
+            pk=PRIOR_ID, defaults={'mean': compute_prior(), 'computed_at': timezone.now()}
+        )
+        prior = row.mean
+    return prior
+
+
+def weighted_score(rating_sum, rating_count, prior, weight=None):
+    if weight is None:
+        weight = get_config()['PRIOR_WEIGHT']
+    return (weight * prior + rating_sum) / (weight + rating_count)
+
+
+def weighted_score_expression(score_delta=0, count_delta=0, prior=None):
+    """weighted_score of a row as an SQL expression, after adjusting its totals by the deltas"""
+    if prior is None:
+        prior = get_prior()
+    weight = get_config()['PRIOR_WEIGHT']
+    return ExpressionWrapper(
+        (Value(weight * prior) + F('rating_sum') + score_delta) / (Value(float(weight)) + F('rating_count') + count_delta),
+        output_field=FloatField(),
+    )
+
+
+def recompute_weighted_scores(queryset=None):
+    """Aggregate and store a new prior and rewrite weighted_score on every row with one UPDATE; returns the prior"""
+    if queryset is None:
+        queryset = Anime.objects.all()
+    with transaction.atomic():
+        prior = compute_prior()
+        RankingPrior.objects.update_or_create(pk=PRIOR_ID, defaults={'mean': prior, 'computed_at': timezone.now()})
+        queryset.update(weighted_score=weighted_score_expression(prior=prior))
+    return prior
+
+
+def bump_ranking_versions():
+    """Invalidate every cached response that shows weighted_score or the rating totals"""
+    bump_version(CATALOGUE, RATINGS, RANKING)
+
+
+def histogram(anime):
+    """{"1": count, ..., "10": count} from the anime's counters"""
+    return {str(score): getattr(anime, histogram_field(score)) for score in SCORES}
+
+
+def median(counts):
+    """Median score of a {"score": count} histogram"""
+    total = sum(counts.values())
+    if not total:
+        return None
+    # The two middle ratings; the same one when the count is odd
+    middle = ((total - 1) // 2, total // 2)
+    values = []
+    seen = 0
+    for score in SCORES:
+        count = counts.get(str(score), 0)
+        while len(values) < 2 and seen + count > middle[len(values)]:
+            values.append(score)
+        seen += count
+    return sum(values) / 2
+
+
+def rating_summary(anime):
+    counts = histogram(anime)
+    return {
+        'anime_id': anime.pk,
+        'rating_count': anime.rating_count,
+        'mean': round(anime.rating_sum / anime.rating_count, 2) if anime.rating_count else None,
+        'median': median(counts),
+        'weighted_score': round(anime.weighted_score, 3),
+        'histogram': counts,
+    }
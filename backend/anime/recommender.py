@@ -0,0 +1,465 @@
+"""
+Item-item collaborative filtering engine.
+
+Ratings, centred on the middle of the 1-10 scale so that a low score counts
+as negative evidence, form a sparse users x anime matrix X. The item-item
+dot products X'X and common-rater counts are computed with sparse products
+one block of anime at a time, and only the top-K neighbours of each anime
+are kept; no table of all item pairs is ever held. A user with more than
+MAX_USER_RATINGS ratings contributes a fixed sample of them, which bounds
+the cost a single heavy rater adds to the build.
+
+Requests never build the engine. get_engine() serves the current one and,
+when it is missing or older than MAX_AGE, has a background worker rebuild
+it and swap the finished engine in with a single assignment. Until the first
+build finishes the engine is empty and the recommendation pipeline relies on
+its other sources.
+
+Committed rating writes are queued for the same worker, which applies each
+one incrementally: only similarities involving the rated anime change, so
+its similarity column is recomputed from its raters (each contributing at
+most MAX_USER_RATINGS ratings) and merged into the neighbour lists it can
+enter, leave or move in. A list that loses an entry below the anime it
+pruned is recomputed alone. verify_recommender checks the result against a
+full rebuild.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+SCALE_MIDPOINT = 5.5
+
+DEFAULTS = {
+    # Neighbours kept per anime in the similarity table
+    'TOP_K': 50,
+    # Damping for similarities backed by only a handful of common raters
+    'SHRINKAGE': 10,
+    # Seconds before the in-process engine is rebuilt from the database
+    'MAX_AGE': 60 * 60,
+    # Ratings of one user that count towards item similarities; heavier
+    # raters contribute a fixed sample of this many
+    'MAX_USER_RATINGS': 500,
+    # Upper bound on collaborative candidates considered per request
+    'CANDIDATES': 100,
+    # Seconds a user's precomputed recommendations (anime.materialized) are served
+    'MATERIALIZED_MAX_AGE': 24 * 60 * 60,
+    # Content neighbours stored per anime by anime.content
+    'CONTENT_TOP_K': 20,
+    # Weight of each anime.pipeline candidate source in the hybrid score
+    # (0 disables the source); 'quality' weighs the anime's own rating
+    'HYBRID_WEIGHTS': {
+        'collaborative': 1.0,
+        'similar': 1.0,
+        'content': 0.8,
+        'genres': 0.3,
+        'popular': 0.2,
+        'quality': 0.1,
+    },
+    # 0 ranks by score alone, 1 by genre novelty alone
+    'DIVERSITY': 0.3,
+    # Collaborative predictions: 'item' (this engine) or 'als' (anime.als)
+    'ENGINE': 'item',
+    # Directory of the trained ALS factors, and the train_als defaults
+    'ALS_PATH': None,
+    'ALS_FACTORS': 32,
+    'ALS_REGULARIZATION': 0.3,
+    'ALS_ITERATIONS': 15,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'RECOMMENDER', {}))
+    return config
+
+
+# Dense cells (anime x block) of one block of the similarity computation
+BLOCK_CELLS = 2000000
+
+# Seconds between background build attempts after a failure
+RETRY_AFTER = 60
+
+_MASK = (1 << 64) - 1
+
+
+def sample_key(user_id, anime_id):
+    """Hash that orders a user's ratings for the heavy-rater sample"""
+    return ((user_id * 0x9E3779B1) ^ (anime_id * 0x85EBCA6B)) & _MASK
+
+
+def sample_mask(users, items, limit):
+    """
+    Mask keeping each user's `limit` ratings with the smallest sample_key,
+    so rebuilds and incremental updates agree on which ratings count
+    """
+    keep = np.ones(len(users), dtype=bool)
+    if not len(users) or not limit:
+        return keep
+    keys = (users.astype(np.uint64) * np.uint64(0x9E3779B1)) ^ (items.astype(np.uint64) * np.uint64(0x85EBCA6B))
+    order = np.lexsort((keys, users))
+    sorted_users = users[order]
+    starts = np.flatnonzero(np.r_[True, sorted_users[1:] != sorted_users[:-1]])
+    lengths = np.diff(np.r_[starts, len(users)])
+    rank = np.arange(len(users)) - np.repeat(starts, lengths)
+    keep[:] = False
+    keep[order[rank < limit]] = True
+    return keep
+
+
+class ItemSimilarityEngine:
+    def __init__(
+        self, top_k=DEFAULTS['TOP_K'], shrinkage=DEFAULTS['SHRINKAGE'],
+        max_user_ratings=DEFAULTS['MAX_USER_RATINGS']
+    ):
+        self.top_k = top_k
+        self.shrinkage = shrinkage
+        self.max_user_ratings = max_user_ratings
+        self.built_at = None
+        # Centred scores that count: {user_id: {anime_id: deviation}} and by anime
+        self.user_ratings = {}
+        self._raters = defaultdict(dict)
+        # A heavy rater's ratings left out of the sample, by user
+        self._spare = {}
+        # Sum of squared deviations per anime
+        self._squares = defaultdict(float)
+        # Top-K neighbour table: {anime_id: [(similarity, anime_id), ...]}, best first
+        self._neighbours = {}
+        # anime_id -> anime whose neighbour lists hold it
+        self._listed_by = defaultdict(set)
+
+    @property
+    def age(self):
+        if self.built_at is None:
+            return float('inf')
+        return time.monotonic() - self.built_at
+
+    def build(self, ratings=None):
+        """Compute the neighbour table from every rating, or from (user_id, anime_id, score) `ratings`"""
+        if ratings is None:
+            from .als import load_ratings
+            users, items, scores = load_ratings()
+        else:
+            rows = np.array(list(ratings), dtype=np.int64).reshape(-1, 3)
+            users, items, scores = rows[:, 0], rows[:, 1], rows[:, 2]
+        users, items, scores = np.asarray(users), np.asarray(items), np.asarray(scores)
+        keep = sample_mask(users, items, self.max_user_ratings)
+        deviations = scores - SCALE_MIDPOINT
+        for user_id, anime_id, deviation, kept in zip(
+            users.tolist(), items.tolist(), deviations.tolist(), keep.tolist()
+        ):
+            if kept:
+                self.user_ratings.setdefault(user_id, {})[anime_id] = deviation
+                self._raters[anime_id][user_id] = deviation
+            else:
+                self._spare.setdefault(user_id, {})[anime_id] = deviation
+        users, items, deviations = users[keep], items[keep], deviations[keep]
+
+        anime_ids, columns = np.unique(items, return_inverse=True)
+        _, rows = np.unique(users, return_inverse=True)
+        shape = (int(rows.max()) + 1 if len(rows) else 0, len(anime_ids))
+        centred = sparse.csr_matrix((deviations, (rows, columns)), shape=shape)
+        # Scores are integers, so no centred score is zero and both share a pattern
+        raters = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=shape)
+        squares = np.asarray(centred.multiply(centred).sum(axis=0)).ravel()
+        self._squares.update(zip(anime_ids.tolist(), squares.tolist()))
+        norms = np.sqrt(squares)
+
+        centred_t, raters_t = centred.T.tocsr(), raters.T.tocsr()
+        centred, raters = centred.tocsc(), raters.tocsc()
+        block = max(1, BLOCK_CELLS // max(len(anime_ids), 1))
+        k = min(self.top_k, len(anime_ids) - 1)
+        for start in range(0, len(anime_ids), block):
+            stop = min(start + block, len(anime_ids))
+            dots = (centred_t @ centred[:, start:stop]).toarray()
+            common = (raters_t @ raters[:, start:stop]).toarray()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                similarity = dots / np.outer(norms, norms[start:stop])
+            similarity *= common / (common + self.shrinkage)
+            similarity[~np.isfinite(similarity) | (common == 0)] = 0.0
+            similarity[np.arange(start, stop), np.arange(stop - start)] = 0.0
+            if k <= 0:
+                continue
+            top = np.argpartition(-similarity, k - 1, axis=0)[:k]
+            for offset in range(stop - start):
+                best = top[:, offset][np.argsort(-similarity[top[:, offset], offset], kind='stable')]
+                self._set_neighbours(int(anime_ids[start + offset]), [
+                    (float(similarity[row, offset]), int(anime_ids[row]))
+                    for row in best if similarity[row, offset] > 0
+                ])
+
+        self.built_at = time.monotonic()
+        return self
+
+    def _set_neighbours(self, anime_id, neighbours):
+        # Lists are replaced, never changed in place, so readers need no lock
+        for _, j in self._neighbours.get(anime_id, ()):
+            self._listed_by[j].discard(anime_id)
+        for _, j in neighbours:
+            self._listed_by[j].add(anime_id)
+        self._neighbours[anime_id] = neighbours
+
+    def _similarities(self, anime_id):
+        """Positive similarities of `anime_id` to every anime, from the raters it shares with each"""
+        dots = defaultdict(float)
+        common = defaultdict(int)
+        for user_id, deviation in self._raters.get(anime_id, {}).items():
+            for j, other in self.user_ratings[user_id].items():
+                dots[j] += deviation * other
+                common[j] += 1
+        dots.pop(anime_id, None)
+        similarities = {}
+        for j, dot in dots.items():
+            denominator = math.sqrt(self._squares[anime_id] * self._squares[j])
+            if denominator:
+                similarity = dot / denominator * common[j] / (common[j] + self.shrinkage)
+                if similarity > 0:
+                    similarities[j] = similarity
+        return similarities
+
+    def _top(self, similarities):
+        return heapq.nlargest(self.top_k, ((sim, j) for j, sim in similarities.items()))
+
+    def _count(self, user_id, anime_id, deviation):
+        self.user_ratings.setdefault(user_id, {})[anime_id] = deviation
+        self._raters[anime_id][user_id] = deviation
+
+    def _uncount(self, user_id, anime_id):
+        deviation = self.user_ratings[user_id].pop(anime_id)
+        del self._raters[anime_id][user_id]
+        return deviation
+
+    def _set_rating(self, user_id, anime_id, score):
+        """Record one rating (None deletes it); returns the anime whose counted ratings changed"""
+        counted = self.user_ratings.get(user_id, {})
+        spare = self._spare.setdefault(user_id, {})
+        deviation = None if score is None else score - SCALE_MIDPOINT
+        if counted.get(anime_id) == deviation and deviation is not None:
+            return set()
+        changed = set()
+        if anime_id in counted:
+            self._uncount(user_id, anime_id)
+            changed.add(anime_id)
+        spare.pop(anime_id, None)
+        if deviation is not None:
+            spare[anime_id] = deviation
+
+        # Keep the sample at the ratings with the smallest keys; one rating
+        # moved, so at most one promotion or one swap is needed
+        key = lambda j: sample_key(user_id, j)
+        if spare and len(counted) < (self.max_user_ratings or float('inf')):
+            promoted = min(spare, key=key)
+            self._count(user_id, promoted, spare.pop(promoted))
+            changed.add(promoted)
+        elif spare and counted:
+            promoted, demoted = min(spare, key=key), max(counted, key=key)
+            if key(promoted) < key(demoted):
+                spare[demoted] = self._uncount(user_id, demoted)
+                self._count(user_id, promoted, spare.pop(promoted))
+                changed.update((promoted, demoted))
+        if not spare:
+            del self._spare[user_id]
+        for j in changed:
+            self._squares[j] = sum(d * d for d in self._raters[j].values())
+        return changed
+
+    def apply_rating(self, user_id, anime_id, score):
+        """
+        Bring the neighbour table up to date with one user's rating of an
+        anime being set to `score`, or deleted (None). Only similarities that
+        involve the anime whose counted ratings changed can move, so their
+        columns are recomputed from their raters and merged into the lists
+        that can gain, lose or reorder them; a list that loses an entry to
+        anime it pruned is recomputed in full.
+        """
+        for anime_id in self._set_rating(user_id, anime_id, score):
+            self._refresh(anime_id)
+
+    def _refresh(self, anime_id):
+        similarities = self._similarities(anime_id)
+        self._set_neighbours(anime_id, self._top(similarities))
+        for j in set(similarities) | set(self._listed_by[anime_id]):
+            current = self._neighbours.get(j, [])
+            similarity = similarities.get(j, 0.0)
+            kept = [(sim, other) for sim, other in current if other != anime_id]
+            if len(kept) < len(current):
+                # Pruned anime score at most the old weakest entry
+                if len(current) >= self.top_k and similarity < current[-1][0]:
+                    self._set_neighbours(j, self._top(self._similarities(j)))
+                    continue
+            elif similarity <= 0 or (len(current) >= self.top_k and similarity <= current[-1][0]):
+                continue
+            if similarity > 0:
+                kept.append((similarity, anime_id))
+            self._set_neighbours(j, sorted(kept, reverse=True)[:self.top_k])
+
+    def compare(self, other, tolerance=1e-6):
+        """Differences between the neighbour tables of two engines, as printable lines"""
+        differences = []
+        for anime_id in sorted(set(self._neighbours) | set(other._neighbours)):
+            mine, theirs = self.neighbours(anime_id), other.neighbours(anime_id)
+            if len(mine) != len(theirs):
+                differences.append(f'anime {anime_id}: {len(mine)} neighbours vs {len(theirs)}')
+                continue
+            for rank, ((a, _), (b, _)) in enumerate(zip(mine, theirs)):
+                if abs(a - b) > tolerance:
+                    differences.append(f'anime {anime_id} rank {rank}: similarity {a:.6f} vs {b:.6f}')
+        return differences
+
+    def neighbours(self, anime_id):
+        """Top-K most similar anime as a list of (similarity, anime_id)"""
+        return self._neighbours.get(anime_id, [])
+
+    def similar_items(self, anime_id, limit=None):
+        """Anime most similar to `anime_id` as (anime_id, similarity) pairs"""
+        neighbours = self.neighbours(anime_id)[:limit]
+        return [(j, sim) for sim, j in neighbours]
+
+    def recommend_for_user(self, user_scores, limit=None):
+        """
+        Predict scores for anime the user has not rated from the neighbours
+        of the anime they have. Returns (anime_id, predicted deviation) pairs
+        for anime predicted above the middle of the scale, best first.
+        """
+        totals = defaultdict(float)
+        weights = defaultdict(float)
+        for i, score in user_scores.items():
+            deviation = score - SCALE_MIDPOINT
+            for sim, j in self.neighbours(i):
+                if j in user_scores:
+                    continue
+                totals[j] += sim * deviation
+                weights[j] += sim
+
+        predictions = (
+            (totals[j] / weights[j], j) for j in totals if weights[j]
+        )
+        positive = (pair for pair in predictions if pair[0] > 0)
+        if limit is None:
+            ranked = sorted(positive, reverse=True)
+        else:
+            ranked = heapq.nlargest(limit, positive)
+        return [(j, prediction) for prediction, j in ranked]
+
+
+_engine = None
+_empty_engine = ItemSimilarityEngine()
+_worker_lock = threading.Lock()
+_working = False
+_rebuild_requested = False
+_build_started_at = None
+# Rating writes waiting for the worker: (user_id, anime_id, score or None)
+_pending = deque()
+
+
+def build_engine():
+    """Build an engine from the database now and swap it in for this process"""
+    global _engine
+    config = get_config()
+    engine = ItemSimilarityEngine(
+        top_k=config['TOP_K'],
+        shrinkage=config['SHRINKAGE'],
+        max_user_ratings=config['MAX_USER_RATINGS'],
+    ).build()
+    _engine = engine
+    return engine
+
+
+def _work():
+    """Background worker: rebuild when asked, then apply queued ratings in order"""
+    global _working, _rebuild_requested
+    try:
+        while True:
+            with _worker_lock:
+                rebuild, _rebuild_requested = _rebuild_requested, False
+                if not rebuild and not _pending:
+                    _working = False
+                    return
+            if rebuild:
+                try:
+                    build_engine()
+                except Exception:
+                    logger.exception('Building the item similarity engine failed')
+                    if _engine is None:
+                        # The next build reads these ratings from the database
+                        _pending.clear()
+                continue
+            user_id, anime_id, score = _pending.popleft()
+            engine = _engine
+            if engine is not None:
+                engine.apply_rating(user_id, anime_id, score)
+    except Exception:
+        logger.exception('Updating the item similarity engine failed')
+        with _worker_lock:
+            _working = False
+    finally:
+        # The thread's own connection would otherwise stay open
+        connections.close_all()
+
+
+def _start_worker(rebuild=False):
+    global _working, _rebuild_requested, _build_started_at
+    with _worker_lock:
+        if rebuild:
+            _rebuild_requested = True
+            _build_started_at = time.monotonic()
+        if not _working:
+            _working = True
+            threading.Thread(target=_work, name='item-similarity-engine', daemon=True).start()
+
+
+def get_engine():
+    """
+    The process-wide engine, without waiting for a build: a missing or stale
+    engine is rebuilt in the background worker while the current one (or an
+    empty one) keeps serving
+    """
+    engine = _engine
+    if engine is None or engine.age > get_config()['MAX_AGE']:
+        started = _build_started_at
+        if started is None or time.monotonic() - started > RETRY_AFTER:
+            _start_worker(rebuild=True)
+    return engine if engine is not None else _empty_engine
+
+
+def apply_rating(user_id, anime_id, score):
+    """
+    Queue one committed rating write (`score` None for a delete) for the
+    background worker. Ratings are set, not added, so one that a concurrent
+    rebuild already read is applied again harmlessly.
+    """
+    if _engine is None and not _working:
+        # The first build reads it from the database
+        return
+    _pending.append((user_id, anime_id, score))
+    _start_worker()
+
+
+def recommend_for_user(user_scores, limit=None):
+    """
+    Collaborative (anime_id, predicted deviation) pairs from the configured
+    engine; the ALS model falls back to the item-item engine until trained
+    """
+    if get_config()['ENGINE'] == 'als':
+        from . import als
+        model = als.get_model()
+        if model is not None:
+            return model.recommend(user_scores, limit or len(model.anime_ids))
+    return get_engine().recommend_for_user(user_scores, limit=limit)
+
+
+def reset_engine():
+    global _engine, _build_started_at
+    with _worker_lock:
+        _engine = None
+        _build_started_at = None
+        _pending.clear()
@@ -0,0 +1,214 @@
+"""
+Full-text search over the anime catalogue.
+
+SQLite uses an FTS5 virtual table ranked with bm25(), PostgreSQL a side table
+holding a weighted tsvector behind a GIN index. Both are keyed by anime id and
+kept in sync by the signal handlers in anime.signals. Other databases fall
+back to the old icontains filtering.
+"""
+import re
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Q
+
+from .models import Anime
+
+TABLE = 'anime_search'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def _documents(anime_ids):
+    """Indexable text for each anime: title, studio, genre names, description"""
+    documents = {
+        pk: [title, studio, [], description]
+        for pk, title, studio, description in Anime.objects.filter(pk__in=anime_ids)
+        .values_list('pk', 'title', 'studio', 'description')
+    }
+    through = Anime.genres.through.objects.filter(anime_id__in=list(documents))
+    for anime_id, genre_name in through.values_list('anime_id', 'genre__name'):
+        documents[anime_id][2].append(genre_name)
+    return {
+        pk: (title, studio, ' '.join(genres), description)
+        for pk, (title, studio, genres, description) in documents.items()
+    }
+
+
+class FallbackSearchBackend:
+    """Unindexed substring matching, for databases without a full-text backend"""
+
+    def install(self):
+        pass
+
+    def index(self, anime_ids):
+        pass
+
+    def remove(self, anime_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def is_current(self):
+        return True
+
+    def search(self, query, limit, offset=0):
+        queryset = Anime.objects.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(studio__icontains=query) |
+            Q(genres__name__icontains=query)
+        ).distinct().order_by('-rating', 'pk')
+        return list(queryset.values_list('pk', flat=True)[offset:offset + limit])
+
+
+class IndexedSearchBackend:
+    """Shared bookkeeping for the backends that keep an `anime_search` table"""
+    batch_size = 500
+
+    def rebuild(self):
+        # One transaction: committing every batch separately costs a sync each
+        with transaction.atomic():
+            self.clear()
+            pks = list(Anime.objects.values_list('pk', flat=True).order_by('pk'))
+            for start in range(0, len(pks), self.batch_size):
+                self.index(pks[start:start + self.batch_size])
+
+    def is_current(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+            indexed = cursor.fetchone()[0]
+        return indexed == Anime.objects.count()
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+
+
+class SQLiteSearchBackend(IndexedSearchBackend):
+    # bm25() column weights: title, studio, genres, description
+    weights = (10.0, 4.0, 3.0, 1.0)
+
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+                'title, studio, genres, description, '
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+
+    def index(self, anime_ids):
+        anime_ids = list(anime_ids)
+        documents = _documents(anime_ids)
+        with connection.cursor() as cursor:
+            self._delete(cursor, anime_ids)
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, title, studio, genres, description) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                [(pk, *document) for pk, document in documents.items()]
+            )
+
+    def remove(self, anime_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, list(anime_ids))
+
+    def _delete(self, cursor, anime_ids):
+        if anime_ids:
+            placeholders = ', '.join(['%s'] * len(anime_ids))
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})', anime_ids)
+
+    def search(self, query, limit, offset=0):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Every token must match, as a prefix so partially typed words hit
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'ORDER BY bm25({TABLE}, {weights}), rowid LIMIT %s OFFSET %s',
+                [match, limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(IndexedSearchBackend):
+    def install(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+                f'anime_id bigint PRIMARY KEY REFERENCES {Anime._meta.db_table} (id) '
+                'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+                'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {TABLE}_document_gin ON {TABLE} USING GIN (document)'
+            )
+
+    def index(self, anime_ids):
+        rows = [
+            (pk, title, studio, genres, description)
+            for pk, (title, studio, genres, description) in _documents(list(anime_ids)).items()
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (anime_id, document) VALUES (%s, '
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C')) "
+                'ON CONFLICT (anime_id) DO UPDATE SET document = EXCLUDED.document',
+                rows
+            )
+
+    def remove(self, anime_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE anime_id = ANY(%s)', [list(anime_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {TABLE}')
+
+    def search(self, query, limit, offset=0):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT anime_id FROM {TABLE}, to_tsquery('simple', %s) query "
+                'WHERE document @@ query '
+                'ORDER BY ts_rank_cd(document, query) DESC, anime_id LIMIT %s OFFSET %s',
+                [tsquery, limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+_backends = {}
+
+
+def get_backend():
+    """Search backend for the default database connection"""
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == 'sqlite' and _sqlite_has_fts5():
+            _backends[vendor] = SQLiteSearchBackend()
+        elif vendor == 'postgresql':
+            _backends[vendor] = PostgresSearchBackend()
+        else:
+            _backends[vendor] = FallbackSearchBackend()
+    return _backends[vendor]
+
+
+def _sqlite_has_fts5():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            return bool(cursor.fetchone()[0])
+    except OperationalError:
+        return False
@@ -1,10 +1,56 @@
 
 from rest_framework import serializers
+from . import ranking
 from .models import Anime, Genre, Rating, Comment
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+def requested_fields(request):
+    """Field names asked for with ?fields=a,b,c, or None for all fields"""
+    if request is None:
+        return None
+    value = request.query_params.get('fields', '')
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    return names or None
+
+MAX_REQUESTED_IDS = 500
+
+def requested_ids(request, limit=MAX_REQUESTED_IDS):
+    """Distinct anime ids from ?ids=1,2,3 (or repeated ?ids=); ValueError if malformed"""
+    values = ','.join(request.query_params.getlist('ids'))
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values.split(',') if value.strip()))
+    except ValueError:
+        ids = None
+    if not ids:
+        raise ValueError('ids must be a comma-separated list of anime ids')
+    if len(ids) > limit:
+        raise ValueError(f'At most {limit} ids can be looked up per request')
+    return ids
+
+class SparseFieldsetMixin:
+    """
+    Lets the top-level serializer be trimmed to the fields requested with
+    ?fields=... or passed as `fields=` to the constructor. Unknown names are
+    ignored; nested uses of the serializer always render every field.
+    """
+    def __init__(self, *args, **kwargs):
+        self._sparse_fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self._sparse_fields
+        is_top_level = self.parent is None or self.parent is self.root
+        if requested is None and is_top_level:
+            requested = requested_fields(self.context.get('request'))
+        if requested:
+            kept = {name: field for name, field in fields.items() if name in requested}
+            if kept:
+                return kept
+        return fields
+
 class GenreSerializer(serializers.ModelSerializer):
     class Meta:
         model = Genre
@@ -33,7 +79,7 @@ class RatingSerializer(serializers.ModelSerializer):
         model = Rating
         fields = ('id', 'anime_id', 'user', 'score', 'created_at')
 
-class AnimeSerializer(serializers.ModelSerializer):
+class AnimeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     genres = serializers.SlugRelatedField(
         many=True,
         read_only=True,
@@ -49,13 +95,37 @@ class AnimeSerializer(serializers.ModelSerializer):
 
 class AnimeDetailSerializer(serializers.ModelSerializer):
     genres = GenreSerializer(many=True, read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
-    ratings = RatingSerializer(many=True, read_only=True)
+    summary = serializers.SerializerMethodField()
+    
+    # Full comment and rating lists are served, paginated, by
+    # /anime/<id>/comments/ and /anime/<id>/ratings/
+    latest_comments = 5
     
     class Meta:
         model = Anime
         fields = (
             'id', 'title', 'image', 'description', 'year',
             'type', 'episodes', 'rating', 'genres', 'studio',
-            'comments', 'ratings'
+            'summary'
+        )
+    
+    def get_summary(self, obj):
+        # The async detail view runs these queries concurrently and passes the result in
+        if 'summary' in self.context:
+            return self.context['summary']
+        return detail_summary(
+            obj,
+            obj.comments.count(),
+            obj.comments.select_related('user').order_by('-created_at', '-id')[:self.latest_comments],
+            context=self.context,
         )
+
+def detail_summary(anime, comment_count, latest_comments, context=None):
+    """The `summary` of AnimeDetailSerializer from its query results"""
+    return {
+        'rating_count': anime.rating_count,
+        # Kept per score on the anime row by anime.aggregates
+        'rating_histogram': ranking.histogram(anime),
+        'comment_count': comment_count,
+        'latest_comments': CommentSerializer(latest_comments, many=True, context=context).data,
+    }
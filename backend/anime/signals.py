@@ -0,0 +1,155 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from users import activity
+
+from . import content, materialized, ranking, recommender, search
+from .aggregates import apply_rating_change
+from .models import Anime, Comment, Genre, Rating, SimilarAnime
+from .versions import (
+    CATALOGUE, COMMENTS, GENRES, RATINGS, anime_comments_version,
+    anime_ratings_version, anime_version, bump_version
+)
+
+
+def bump_on_commit(*names):
+    transaction.on_commit(lambda: bump_version(*names))
+
+
+_bulk = threading.local()
+
+
+@contextmanager
+def bulk_comment_delete():
+    """
+    Comment delete receivers do nothing inside the block; the caller adjusts
+    activity counters and cache versions once for the whole set
+    """
+    _bulk.comments = True
+    try:
+        yield
+    finally:
+        _bulk.comments = False
+
+
+def in_bulk_comment_delete():
+    return getattr(_bulk, 'comments', False)
+
+
+def bump_rating_versions(anime_id):
+    bump_on_commit(RATINGS, anime_version(anime_id), anime_ratings_version(anime_id))
+
+
+def enqueue_recommendation_refresh(user_id):
+    # The user's stored recommendations no longer reflect their ratings
+    transaction.on_commit(lambda: materialized.enqueue(user_id))
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created, **kwargs):
+    old_score = None if created else getattr(instance, '_loaded_score', None)
+    new_score = instance.score
+    instance._loaded_score = new_score
+    apply_rating_change(instance.anime_id, old_score, new_score)
+    activity.apply_rating_change(instance.user_id, instance.anime_id, old_score, new_score)
+    transaction.on_commit(lambda: recommender.apply_rating(instance.user_id, instance.anime_id, new_score))
+    bump_rating_versions(instance.anime_id)
+    enqueue_recommendation_refresh(instance.user_id)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    old_score = getattr(instance, '_loaded_score', None) or instance.score
+    apply_rating_change(instance.anime_id, old_score, None)
+    activity.apply_rating_change(instance.user_id, instance.anime_id, old_score, None)
+    transaction.on_commit(lambda: recommender.apply_rating(instance.user_id, instance.anime_id, None))
+    bump_rating_versions(instance.anime_id)
+    enqueue_recommendation_refresh(instance.user_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    if in_bulk_comment_delete():
+        return
+    bump_on_commit(COMMENTS, anime_version(instance.anime_id), anime_comments_version(instance.anime_id))
+
+
+def install_search_index(sender, **kwargs):
+    """Create the full-text table after migrate and fill it if it is behind"""
+    backend = search.get_backend()
+    backend.install()
+    if not backend.is_current():
+        backend.rebuild()
+
+
+@receiver(pre_save, sender=Anime)
+def anime_saving(sender, instance, **kwargs):
+    if instance._state.adding:
+        # A new anime starts at the prior; rating writes move it from there
+        instance.weighted_score = ranking.weighted_score(instance.rating_sum, instance.rating_count, ranking.get_prior())
+
+
+@receiver(post_save, sender=Anime)
+def anime_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: search.get_backend().index([instance.pk]))
+    transaction.on_commit(lambda: content.enqueue([instance.pk]))
+    bump_on_commit(CATALOGUE, anime_version(instance.pk))
+
+
+@receiver(pre_delete, sender=Anime)
+def anime_deleting(sender, instance, **kwargs):
+    # Neighbour rows pointing at this anime cascade away with it
+    instance._listed_by = list(SimilarAnime.objects.filter(similar=instance).values_list('anime_id', flat=True))
+
+
+@receiver(post_delete, sender=Anime)
+def anime_deleted(sender, instance, **kwargs):
+    listed_by = getattr(instance, '_listed_by', [])
+    transaction.on_commit(lambda: search.get_backend().remove([instance.pk]))
+    # The lists that held it lost a row to the cascade
+    transaction.on_commit(lambda: content.enqueue([instance.pk, *listed_by]))
+    bump_on_commit(CATALOGUE, anime_version(instance.pk))
+
+
+@receiver(m2m_changed, sender=Anime.genres.through)
+def anime_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        anime_ids = [instance.pk]
+    elif action == 'pre_clear':
+        # genre.anime.clear() reports no pk_set afterwards, so remember it now
+        instance._cleared_anime_ids = list(instance.anime.values_list('pk', flat=True))
+        return
+    elif action == 'post_clear':
+        anime_ids = getattr(instance, '_cleared_anime_ids', [])
+    else:
+        anime_ids = list(pk_set or ())
+    if action.startswith('post_') and anime_ids:
+        transaction.on_commit(lambda: search.get_backend().index(anime_ids))
+        transaction.on_commit(lambda: content.enqueue(anime_ids))
+        bump_on_commit(CATALOGUE, *[anime_version(pk) for pk in anime_ids])
+
+
+@receiver(post_save, sender=Genre)
+def genre_saved(sender, instance, created, **kwargs):
+    bump_on_commit(GENRES, CATALOGUE)
+    if created:
+        return
+    anime_ids = list(instance.anime.values_list('pk', flat=True))
+    if anime_ids:
+        # Content vectors key genres by id, so a rename leaves them as they are
+        transaction.on_commit(lambda: search.get_backend().index(anime_ids))
+
+
+@receiver(pre_delete, sender=Genre)
+def genre_deleted(sender, instance, **kwargs):
+    # The through rows are removed without m2m_changed, so reindex by hand
+    bump_on_commit(GENRES, CATALOGUE)
+    anime_ids = list(instance.anime.values_list('pk', flat=True))
+    if anime_ids:
+        transaction.on_commit(lambda: search.get_backend().index(anime_ids))
+        transaction.on_commit(lambda: content.enqueue(anime_ids))
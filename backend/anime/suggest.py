@@ -0,0 +1,184 @@
+"""
+Typeahead index over anime titles and studios.
+
+Keys are kept in one sorted list so a prefix lookup is two bisections. Every
+word of a title starts a key of its own, so "tit" completes "Attack on Titan".
+When a prefix finds too little, the last word of the query is matched against
+the vocabulary with one edit of slack to absorb typos.
+
+The index is rebuilt when the catalogue version moves on, and after the
+recommender's MAX_AGE in any case: with the local-memory cache a write in
+another process never moves this process's version.
+"""
+import bisect
+import heapq
+import sys
+import threading
+import time
+import unicodedata
+
+from .models import Anime
+from .recommender import get_config
+from .versions import CATALOGUE, get_version
+
+# Rank of each kind of match, lower is better
+TITLE, TITLE_WORD, STUDIO, TYPO = range(4)
+
+# Most completions a single lookup can return
+MAX_RESULTS = 25
+
+# Prefix ranges wider than this keep their ranked results for reuse
+MEMO_THRESHOLD = 2000
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(''.join(char if char.isalnum() else ' ' for char in text.lower()).split())
+
+
+def within_one_edit(a, b):
+    """True if `a` and `b` differ by at most one insert, delete, substitute or transposition"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    for index, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            if len(a) == len(b):
+                return (
+                    a[index + 1:] == b[index + 1:] or
+                    (a[index:index + 2] == b[index:index + 2][::-1] and a[index + 2:] == b[index + 2:])
+                )
+            return a[index:] == b[index + 1:]
+    return True
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.keys = []
+        self.anime_ids = []
+        self.kinds = []
+        self.vocabulary = []
+        self.anime = {}
+        self.popularity = {}
+        self.version = None
+        self.built_at = None
+        self.bytes = 0
+        self._memo = {}
+
+    def build(self, rows=None, version=None):
+        if rows is None:
+            rows = Anime.objects.values_list('id', 'title', 'image', 'studio', 'rating').iterator(chunk_size=5000)
+        entries = []
+        vocabulary = set()
+        for pk, title, image, studio, rating in rows:
+            self.anime[pk] = {'id': pk, 'title': title, 'image': image}
+            self.popularity[pk] = rating
+            words = normalize(title).split()
+            vocabulary.update(words)
+            for index in range(len(words)):
+                entries.append((' '.join(words[index:]), pk, TITLE if index == 0 else TITLE_WORD))
+            studio_key = normalize(studio)
+            if studio_key:
+                vocabulary.update(studio_key.split())
+                entries.append((studio_key, pk, STUDIO))
+        entries.sort()
+        self.keys = [key for key, _, _ in entries]
+        self.anime_ids = [pk for _, pk, _ in entries]
+        self.kinds = [kind for _, _, kind in entries]
+        self.vocabulary = sorted(vocabulary)
+        self.version = version
+        self.built_at = time.monotonic()
+        self.bytes = self.memory_footprint()
+        return self
+
+    def _top(self, prefix):
+        """Best (kind, anime_id) pairs for keys starting with `prefix`"""
+        if prefix in self._memo:
+            return self._memo[prefix]
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff')
+        best = {}
+        for position in range(start, end):
+            pk = self.anime_ids[position]
+            kind = self.kinds[position]
+            if kind < best.get(pk, TYPO + 1):
+                best[pk] = kind
+        top = heapq.nsmallest(
+            MAX_RESULTS, ((kind, -self.popularity[pk], pk) for pk, kind in best.items())
+        )
+        top = [(kind, pk) for kind, _, pk in top]
+        # Short prefixes span most of the catalogue; rank those only once
+        if end - start > MEMO_THRESHOLD:
+            self._memo[prefix] = top
+        return top
+
+    def _typo_prefixes(self, word):
+        """Vocabulary words whose start is one edit away from `word`"""
+        start = bisect.bisect_left(self.vocabulary, word[0])
+        end = bisect.bisect_left(self.vocabulary, word[0] + '\uffff')
+        seen = set()
+        for candidate in self.vocabulary[start:end]:
+            for length in (len(word) - 1, len(word), len(word) + 1):
+                prefix = candidate[:length]
+                if prefix not in seen and len(prefix) == length and within_one_edit(word, prefix):
+                    seen.add(prefix)
+                    yield prefix
+
+    def suggest(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+        matches = dict((pk, kind) for kind, pk in reversed(self._top(query)))
+
+        words = query.split()
+        if len(matches) < limit and len(words[-1]) >= 3:
+            head = ' '.join(words[:-1])
+            for prefix in self._typo_prefixes(words[-1]):
+                for _, pk in self._top(f'{head} {prefix}'.strip()):
+                    matches.setdefault(pk, TYPO)
+
+        ranked = sorted(matches, key=lambda pk: (matches[pk], -self.popularity[pk], pk))
+        return [self.anime[pk] for pk in ranked[:limit]]
+
+    def memory_footprint(self):
+        """Approximate bytes held by the index structures"""
+        size = sum(sys.getsizeof(container) for container in (
+            self.keys, self.anime_ids, self.kinds, self.vocabulary, self.anime, self.popularity
+        ))
+        size += sum(sys.getsizeof(key) for key in self.keys)
+        size += sum(sys.getsizeof(word) for word in self.vocabulary)
+        for payload in self.anime.values():
+            size += sys.getsizeof(payload) + sum(sys.getsizeof(value) for value in payload.values())
+        # Ids, kinds and ratings are mostly small ints and floats shared with
+        # the payloads, so they are counted once through the payloads above
+        return size
+
+    def stats(self):
+        return {
+            'anime': len(self.anime),
+            'entries': len(self.keys),
+            'vocabulary': len(self.vocabulary),
+            'bytes': self.bytes,
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Process-wide index, rebuilt when the catalogue version moves on or after the recommender's MAX_AGE"""
+    global _index
+    version = get_version(CATALOGUE)
+    max_age = get_config()['MAX_AGE']
+    index = _index
+    if index is None or index.version != version or time.monotonic() - index.built_at > max_age:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != version or time.monotonic() - index.built_at > max_age:
+                _index = index = SuggestIndex().build(version=version)
+    return index
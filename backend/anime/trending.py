@@ -0,0 +1,104 @@
+"""
+Time-decayed trending leaderboard.
+
+Every rating and comment adds exp(-age / tau) to its anime's score, with one
+time constant per window. Because the decay is exponential, a refresh only
+has to multiply the stored scores by exp(-elapsed / tau) in one UPDATE and
+add the events created since the previous refresh; the full history is read
+once, on the first run or with rebuild=True.
+
+New events are found by id rather than by timestamp: a TrendingWatermark row
+per source holds the highest id counted. A row's id and created_at are set
+before its transaction commits, so a refresh counts ids only up to the first
+row younger than SETTLE. An event whose transaction commits within SETTLE of
+its creation is counted exactly once, by this refresh or a later one.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from .models import Comment, Rating, TrendingScore, TrendingWatermark
+from .versions import TRENDING, bump_version
+
+# Window name -> (leaderboard column, decay time constant or None for no decay)
+WINDOWS = {
+    '24h': ('score_24h', timedelta(hours=24)),
+    '7d': ('score_7d', timedelta(days=7)),
+    'all': ('activity', None),
+}
+
+DEFAULT_WINDOW = '24h'
+
+# Watermark name -> event model
+SOURCES = {'rating': Rating, 'comment': Comment}
+
+# Age after which an event is assumed committed, if it ever will be
+SETTLE = timedelta(minutes=1)
+
+DECAYED = [(field, tau.total_seconds()) for field, tau in WINDOWS.values() if tau is not None]
+
+
+def refresh(now=None, rebuild=False):
+    """Bring the leaderboard up to `now`; returns the number of new events"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        last_ids = dict(TrendingWatermark.objects.select_for_update().values_list('source', 'last_id'))
+        watermark = None
+        if rebuild or not last_ids:
+            TrendingScore.objects.all().delete()
+            last_ids = {}
+        else:
+            watermark = TrendingScore.objects.aggregate(Max('computed_at'))['computed_at__max']
+
+        if watermark is not None:
+            elapsed = max((now - watermark).total_seconds(), 0.0)
+            TrendingScore.objects.update(
+                computed_at=now,
+                **{field: F(field) * math.exp(-elapsed / tau) for field, tau in DECAYED}
+            )
+
+        increments = defaultdict(lambda: defaultdict(float))
+        events = 0
+        for source, model in SOURCES.items():
+            last_id = last_ids.get(source, 0)
+            queryset = model.objects.filter(id__gt=last_id)
+            # Rows from the first recent one on may sit beside uncommitted ones
+            unsettled = queryset.filter(created_at__gt=now - SETTLE).aggregate(Min('id'))['id__min']
+            if unsettled is not None:
+                queryset = queryset.filter(id__lt=unsettled)
+            rows = queryset.order_by('id').values_list('id', 'anime_id', 'created_at')
+            for event_id, anime_id, created_at in rows.iterator(chunk_size=5000):
+                age = max((now - created_at).total_seconds(), 0.0)
+                for field, tau in DECAYED:
+                    increments[anime_id][field] += math.exp(-age / tau)
+                increments[anime_id]['activity'] += 1
+                last_id = event_id
+                events += 1
+            TrendingWatermark.objects.update_or_create(source=source, defaults={'last_id': last_id})
+
+        existing = TrendingScore.objects.in_bulk(list(increments))
+        created, updated = [], []
+        for anime_id, deltas in increments.items():
+            row = existing.get(anime_id)
+            if row is None:
+                row = TrendingScore(anime_id=anime_id, computed_at=now)
+                created.append(row)
+            else:
+                updated.append(row)
+            for field, delta in deltas.items():
+                setattr(row, field, getattr(row, field) + (int(delta) if field == 'activity' else delta))
+        fields = [field for field, _ in WINDOWS.values()]
+        TrendingScore.objects.bulk_create(created, batch_size=1000)
+        TrendingScore.objects.bulk_update(updated, fields, batch_size=1000)
+    bump_version(TRENDING)
+    return events
+
+
+def leaderboard(window=DEFAULT_WINDOW, limit=10):
+    """Top `limit` leaderboard rows for `window`, read straight off its index"""
+    field, _ = WINDOWS[window]
+    return TrendingScore.objects.filter(**{f'{field}__gt': 0}).order_by(f'-{field}', 'anime_id')[:limit]
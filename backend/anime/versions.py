@@ -0,0 +1,71 @@
+"""
+Version counters for derived data.
+
+Signal handlers bump a named counter when the data behind it changes, and
+caches and in-process indexes compare the counter they were built at with the
+current one to decide when to rebuild. Counters live in the default cache so
+every worker sharing that cache sees the same value.
+
+A counter that is missing (never set, or culled by the cache) restarts from
+the current time in milliseconds rather than from 1, so it never goes back to
+a value an older cache entry was keyed with.
+"""
+import time
+
+from django.core.cache import cache
+
+CATALOGUE = 'catalogue'
+GENRES = 'genres'
+RATINGS = 'ratings'
+COMMENTS = 'comments'
+TRENDING = 'trending'
+# Everything that shows weighted_score or the rating totals, bumped when they
+# are recomputed for the whole catalogue at once
+RANKING = 'ranking'
+
+KEY_PREFIX = 'anime:version:'
+
+
+def anime_version(anime_id):
+    """Namespace for everything shown about a single anime"""
+    return f'anime:{anime_id}'
+
+
+def anime_comments_version(anime_id):
+    return f'comments:{anime_id}'
+
+
+def anime_ratings_version(anime_id):
+    return f'ratings:{anime_id}'
+
+
+def user_watchlist_version(user_id):
+    return f'watchlist:{user_id}'
+
+
+def _initial():
+    return int(time.time() * 1000)
+
+
+def get_versions(names):
+    """Current value of each counter in `names`, in one cache round trip"""
+    keys = {KEY_PREFIX + name: name for name in names}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # add() so that concurrent first readers agree on the starting value
+        cache.add(key, _initial(), timeout=None)
+        found[key] = cache.get(key, 0)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def get_version(name):
+    return get_versions([name])[name]
+
+
+def bump_version(*names):
+    for name in names:
+        key = KEY_PREFIX + name
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial(), timeout=None)
@@ -1,52 +1,119 @@
 
-import random
-from django.db.models import Q, Count, Avg, F
+from django.db.models import Q, Count, F, prefetch_related_objects
 from rest_framework import status, viewsets, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from . import ranking, search, suggest, trending
+from .cache import CachedResponseMixin
 from .models import Anime, Genre, Rating, Comment
+from .pagination import AnimeCursorPagination, CreatedAtCursorPagination
+from .pipeline import RecommendationPipeline
+from .versions import (
+    CATALOGUE, COMMENTS, GENRES, RANKING, RATINGS, TRENDING, anime_comments_version,
+    anime_ratings_version, anime_version
+)
 from .serializers import (
     AnimeSerializer, AnimeDetailSerializer, GenreSerializer,
-    CommentSerializer, RatingSerializer
+    CommentSerializer, RatingSerializer, requested_fields, requested_ids
 )
 
-class AnimeViewSet(viewsets.ReadOnlyModelViewSet):
+class AnimeViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Anime.objects.all()
+    pagination_class = AnimeCursorPagination
+    # Numeric ids only, so /anime/search/ and friends are not captured as detail routes
+    lookup_value_regex = r'\d+'
+    
+    def get_cache_dependencies(self, request, *args, **kwargs):
+        if 'pk' in kwargs:
+            return [anime_version(kwargs['pk']), GENRES, CATALOGUE, RANKING]
+        return [CATALOGUE, RATINGS, RANKING]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            return queryset.prefetch_related('genres')
+        fields = requested_fields(self.request)
+        if fields:
+            # Skip loading columns (descriptions above all) nobody asked for;
+            # the pagination keys are always needed
+            concrete = {field.name for field in Anime._meta.concrete_fields}
+            queryset = queryset.only(*({'id', 'rating', 'year', 'weighted_score'} | (concrete & set(fields))))
+        if not fields or 'genres' in fields:
+            queryset = queryset.prefetch_related('genres')
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return AnimeDetailSerializer
         return AnimeSerializer
 
-class GenreViewSet(viewsets.ReadOnlyModelViewSet):
+class GenreViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    cache_dependencies = (GENRES,)
 
-class AnimeSearchAPIView(APIView):
+class AnimeSearchAPIView(CachedResponseMixin, APIView):
+    cache_dependencies = (CATALOGUE, RATINGS)
+    default_limit = 20
+    max_limit = 100
+    
     def get(self, request):
         query = request.query_params.get('q', '')
         if not query:
             return Response([])
         
-        anime_list = Anime.objects.filter(
-            Q(title__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(studio__icontains=query) |
-            Q(genres__name__icontains=query)
-        ).distinct()
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+            offset = int(request.query_params.get('offset', 0))
+            if limit < 1 or offset < 0:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'limit and offset must be non-negative integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Ranked ids from the full-text index, then one query for the rows
+        anime_ids = search.get_backend().search(query, limit, offset)
+        anime_by_id = Anime.objects.prefetch_related('genres').in_bulk(anime_ids)
+        anime_list = [anime_by_id[pk] for pk in anime_ids if pk in anime_by_id]
         
         serializer = AnimeSerializer(anime_list, many=True)
         return Response(serializer.data)
 
-class AnimeCommentsAPIView(APIView):
+class AnimeSuggestAPIView(CachedResponseMixin, APIView):
+    cache_dependencies = (CATALOGUE,)
+    default_limit = 10
+    max_limit = 25
+    
+    def get(self, request):
+        """Title/studio completions for the search box"""
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        
+        index = suggest.get_index()
+        response = Response(index.suggest(query, limit) if query else [])
+        stats = index.stats()
+        response['X-Suggest-Index-Entries'] = stats['entries']
+        response['X-Suggest-Index-Bytes'] = stats['bytes']
+        return response
+
+class AnimeCommentsAPIView(CachedResponseMixin, APIView):
+    cache_dependencies = (anime_comments_version('{anime_id}'),)
+    
     def get(self, request, anime_id):
         try:
             anime = Anime.objects.get(pk=anime_id)
-            comments = Comment.objects.filter(anime=anime).order_by('-created_at')
-            serializer = CommentSerializer(comments, many=True)
-            return Response(serializer.data)
+            comments = Comment.objects.filter(anime=anime).select_related('user')
+            paginator = CreatedAtCursorPagination()
+            page = paginator.paginate_queryset(comments, request, view=self)
+            serializer = CommentSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
         except Anime.DoesNotExist:
             return Response(
                 {'error': 'Anime not found'}, 
@@ -74,18 +141,38 @@ class AddCommentAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class AnimeRatingsAPIView(APIView):
+class AnimeRatingsAPIView(CachedResponseMixin, APIView):
+    cache_dependencies = (anime_ratings_version('{anime_id}'),)
+    
     def get(self, request, anime_id):
         try:
             anime = Anime.objects.get(pk=anime_id)
-            ratings = Rating.objects.filter(anime=anime)
-            serializer = RatingSerializer(ratings, many=True)
-            return Response(serializer.data)
+            ratings = Rating.objects.filter(anime=anime).select_related('user')
+            paginator = CreatedAtCursorPagination()
+            page = paginator.paginate_queryset(ratings, request, view=self)
+            serializer = RatingSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+        except Anime.DoesNotExist:
+            return Response(
+                {'error': 'Anime not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+class AnimeRatingSummaryAPIView(CachedResponseMixin, APIView):
+    # Rating writes bump the anime's version; recomputing the prior or the
+    # totals of the whole catalogue bumps RANKING
+    cache_dependencies = (anime_version('{anime_id}'), RANKING)
+    
+    def get(self, request, anime_id):
+        """Rating count, mean, median, weighted score and 1-10 histogram from the anime's counters"""
+        try:
+            anime = Anime.objects.only(*ranking.SUMMARY_FIELDS).get(pk=anime_id)
         except Anime.DoesNotExist:
             return Response(
                 {'error': 'Anime not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(ranking.rating_summary(anime))
 
 class RateAnimeAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -101,18 +188,14 @@ class RateAnimeAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Update or create the rating
+            # Update or create the rating; the anime's rating_sum, rating_count
+            # and average are adjusted by the Rating signals in the same transaction
             rating, created = Rating.objects.update_or_create(
                 anime=anime,
                 user=request.user,
                 defaults={'score': score}
             )
             
-            # Update the anime's average rating
-            avg_rating = Rating.objects.filter(anime=anime).aggregate(Avg('score'))['score__avg']
-            anime.rating = round(avg_rating, 1)
-            anime.save()
-            
             serializer = RatingSerializer(rating)
             return Response(serializer.data)
         except Anime.DoesNotExist:
@@ -120,6 +203,14 @@ class RateAnimeAPIView(APIView):
                 {'error': 'Anime not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+    
+    def delete(self, request, anime_id):
+        """Withdraw the user's score; the signals take it back out of the anime's counters"""
+        # A queryset delete still sends post_delete for each (here: the one) rating
+        deleted, _ = Rating.objects.filter(anime_id=anime_id, user=request.user).delete()
+        if not deleted:
+            return Response({'error': 'Rating not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 class UserRatingAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -131,92 +222,65 @@ class UserRatingAPIView(APIView):
         except Rating.DoesNotExist:
             return Response({'score': None})
 
-class TrendingAnimeAPIView(APIView):
+class UserRatingsAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
     def get(self, request):
-        # Get trending anime based on recent ratings and comments
-        anime_with_activity = Anime.objects.annotate(
-            rating_count=Count('ratings'),
-            comment_count=Count('comments')
-        ).order_by('-rating_count', '-comment_count', '-rating')[:10]
+        """The user's score for every anime in ?ids=1,2,3 (null when unrated)"""
+        try:
+            anime_ids = requested_ids(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = AnimeSerializer(anime_with_activity, many=True)
-        return Response(serializer.data)
+        scores = dict(
+            Rating.objects.filter(user=request.user, anime_id__in=anime_ids)
+            .values_list('anime_id', 'score')
+        )
+        return Response({'scores': {pk: scores.get(pk) for pk in anime_ids}})
 
-class AnimeRecommendationsAPIView(APIView):
+class TrendingAnimeAPIView(CachedResponseMixin, APIView):
+    cache_dependencies = (TRENDING, CATALOGUE, RATINGS, COMMENTS)
+    
     def get(self, request):
-        genres = request.query_params.getlist('genres', [])
-        anime_type = request.query_params.get('type', '')
-        anime_id = request.query_params.get('anime_id', None)
-        user = request.user if request.user.is_authenticated else None
-        
-        # Base queryset
-        queryset = Anime.objects.all()
-        
-        # Collaborative Filtering: Find similar users and their favorite anime
-        if user:
-            # Get user's ratings
-            user_ratings = Rating.objects.filter(user=user).select_related('anime')
-            if user_ratings.exists():
-                # Find users with similar taste (rated same anime highly)
-                user_high_rated_anime = user_ratings.filter(score__gte=7).values_list('anime_id', flat=True)
-                
-                if user_high_rated_anime:
-                    # Find users who also rated these anime highly
-                    similar_users = Rating.objects.filter(
-                        anime_id__in=user_high_rated_anime,
-                        score__gte=7
-                    ).exclude(user=user).values_list('user_id', flat=True).distinct()
-                    
-                    # Get anime these similar users rated highly but current user hasn't watched
-                    user_watched_anime = user_ratings.values_list('anime_id', flat=True)
-                    collaborative_recs = Rating.objects.filter(
-                        user_id__in=similar_users,
-                        score__gte=8
-                    ).exclude(
-                        anime_id__in=user_watched_anime
-                    ).values_list('anime_id', flat=True).distinct()
-                    
-                    if collaborative_recs:
-                        # Boost these anime in recommendations
-                        queryset = queryset.annotate(
-                            is_collab_rec=Count('id', filter=Q(id__in=collaborative_recs))
-                        )
-        
-        # Content-Based Filtering
-        # Filter by anime_id for similar anime
-        if anime_id:
-            try:
-                source_anime = Anime.objects.get(pk=anime_id)
-                source_genres = source_anime.genres.all()
-                queryset = queryset.filter(genres__in=source_genres).exclude(pk=anime_id).distinct()
-            except Anime.DoesNotExist:
-                pass
-        
-        # Filter by genre
-        if genres:
-            queryset = queryset.filter(genres__id__in=genres).distinct()
+        window = request.query_params.get('window', trending.DEFAULT_WINDOW)
+        if window not in trending.WINDOWS:
+            return Response(
+                {'error': f"window must be one of: {', '.join(trending.WINDOWS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Filter by type
-        if anime_type:
-            queryset = queryset.filter(type=anime_type)
+        # Read the top of the precomputed leaderboard (see refresh_trending)
+        leaders = trending.leaderboard(window).select_related('anime')
+        anime_list = [row.anime for row in leaders]
         
-        # Add rating sort with collaborative boost
-        if user and user_ratings.exists():
-            queryset = queryset.order_by('-is_collab_rec', '-rating')
-        else:
-            queryset = queryset.order_by('-rating')
+        if not anime_list:
+            # Leaderboard not computed yet: rank by activity counters instead,
+            # counting comments only for the most rated candidates
+            popular = Anime.objects.order_by('-rating_count', '-weighted_score').values('pk')[:50]
+            anime_list = Anime.objects.filter(pk__in=popular).annotate(
+                comment_count=Count('comments')
+            ).order_by('-rating_count', '-comment_count', '-weighted_score')[:10]
         
-        # Limit results
-        results = queryset[:15]
+        prefetch_related_objects(anime_list, 'genres')
+        serializer = AnimeSerializer(anime_list, many=True)
+        return Response(serializer.data)
+
+class AnimeRecommendationsAPIView(CachedResponseMixin, APIView):
+    # Personalised responses are never cached
+    cache_anonymous_only = True
+    cache_dependencies = (CATALOGUE, RATINGS)
+    
+    def get(self, request):
+        anime_id = request.query_params.get('anime_id', None)
+        pipeline = RecommendationPipeline(
+            user_id=request.user.pk if request.user.is_authenticated else None,
+            anime_id=int(anime_id) if anime_id and anime_id.isdigit() else None,
+            genres=request.query_params.getlist('genres', []),
+            anime_type=request.query_params.get('type', ''),
+        )
+        results = pipeline.run()
         
-        # If we have too few results, add some random recommendations
-        if len(results) < 5:
-            all_anime = list(Anime.objects.all())
-            random_picks = random.sample(all_anime, min(10, len(all_anime)))
-            # Ensure no duplicates
-            for anime in random_picks:
-                if anime not in results:
-                    results.append(anime)
-            
         serializer = AnimeSerializer(results, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        response['Server-Timing'] = pipeline.timings.header()
+        return response
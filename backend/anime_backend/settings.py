@@ -126,3 +126,50 @@ CORS_ALLOWED_ORIGINS = [
 
 # Custom User Model
 AUTH_USER_MODEL = 'users.CustomUser'
+
+# Caches: a local-memory LRU by default. Set CACHE_BACKEND=redis (REDIS_URL)
+# or CACHE_BACKEND=file (CACHE_LOCATION) to share one cache between workers;
+# with local memory, invalidation only reaches the process that wrote.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'anime-backend',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Seconds a cached API response may be served (0 disables response caching)
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Item-item recommendation engine (see anime/recommender.py for all options)
+RECOMMENDER = {
+    'TOP_K': 50,
+    'MAX_AGE': 60 * 60,
+    'ENGINE': os.environ.get('RECOMMENDER_ENGINE', 'item'),
+    'ALS_PATH': os.environ.get('ALS_PATH', os.path.join(BASE_DIR, 'models', 'als')),
+}
+
+# Answer batch watchlist checks from per-process membership bitsets
+# (users/watchlist_cache.py) instead of one IN query per request. Bitsets are
+# invalidated through cache versions, so with several worker processes enable
+# this only on a shared CACHE_BACKEND; entries also expire after
+# WATCHLIST_MEMBERSHIP_TTL seconds
+WATCHLIST_MEMBERSHIP_CACHE = os.environ.get('WATCHLIST_MEMBERSHIP_CACHE', '0') == '1'
+WATCHLIST_MEMBERSHIP_TTL = int(os.environ.get('WATCHLIST_MEMBERSHIP_TTL', 60))
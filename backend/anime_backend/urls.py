@@ -7,6 +7,8 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('anime.urls')),
+    # Async-native read endpoints, for ASGI servers
+    path('api/async/', include('anime.async_urls')),
     path('api/auth/', include('users.urls')),
 ]
 
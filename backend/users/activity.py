@@ -0,0 +1,193 @@
+"""
+Per-user activity counters behind the profile stats endpoint.
+
+Each user has one UserActivityStats row holding their rating, comment and
+watchlist counts, the sum and histogram of their scores, and how many of
+the anime they rated fall in each genre. Signal handlers adjust the row in
+the same transaction as the write that changed it, so the profile page reads
+everything with a single primary-key lookup instead of aggregating the
+Rating, Comment and Watchlist tables.
+
+Plain counters are adjusted with F() expressions. The histogram and genre
+counts are JSON, so they are read, changed and written back under a row
+lock. A user without a row yet gets one built from the tables on their
+next write or stats read.
+
+Genre counts follow the genres an anime had when it was rated; retagging an
+anime is corrected by `rebuild_activity_stats`.
+"""
+import heapq
+import threading
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from anime.models import Anime, Comment, Genre, Rating
+from anime.versions import GENRES, get_version
+
+from .models import UserActivityStats, Watchlist
+
+TOP_GENRES = 5
+
+SCORES = range(1, 11)
+
+
+def empty_histogram():
+    return {str(score): 0 for score in SCORES}
+
+
+def compute(user_id):
+    """A user's stats computed from the Rating, Comment and Watchlist tables (unsaved)"""
+    ratings = Rating.objects.filter(user_id=user_id)
+    histogram = empty_histogram()
+    rating_count = rating_sum = 0
+    for score, count in ratings.values_list('score').annotate(count=Count('id')).order_by():
+        histogram[str(score)] = count
+        rating_count += count
+        rating_sum += score * count
+    genre_counts = dict(
+        Anime.genres.through.objects.filter(anime__ratings__user_id=user_id)
+        .values_list('genre_id').annotate(count=Count('id')).order_by()
+    )
+    return UserActivityStats(
+        user_id=user_id,
+        rating_count=rating_count,
+        rating_sum=rating_sum,
+        comment_count=Comment.objects.filter(user_id=user_id).count(),
+        watchlist_count=Watchlist.objects.filter(user_id=user_id).count(),
+        score_histogram=histogram,
+        genre_counts=genre_counts,
+    )
+
+
+def build(user_id):
+    """Compute and store a user's stats row, returning it"""
+    stats = compute(user_id)
+    try:
+        with transaction.atomic():
+            stats.save(force_insert=True)
+    except IntegrityError:
+        # A concurrent write built it first, from the same tables
+        return UserActivityStats.objects.get(pk=user_id)
+    return stats
+
+
+def get_stats(user_id):
+    """One primary-key lookup, building the row on a user's first read"""
+    stats = UserActivityStats.objects.filter(pk=user_id).first()
+    return stats if stats is not None else build(user_id)
+
+
+def adjust(user_id, field, delta, created):
+    """Add `delta` to one counter; a user's first write builds their whole row"""
+    updated = UserActivityStats.objects.filter(pk=user_id).update(**{field: F(field) + delta})
+    if not updated and created:
+        # The row the signal is about is already in the table
+        build(user_id)
+
+
+def apply_rating_change(user_id, anime_id, old_score, new_score):
+    """
+    Apply one rating create (`old_score` is None), update or delete
+    (`new_score` is None) to the user's counters.
+    """
+    if old_score == new_score:
+        return
+    with transaction.atomic():
+        stats = UserActivityStats.objects.select_for_update().filter(pk=user_id).first()
+        if stats is None:
+            if old_score is None:
+                build(user_id)
+            return
+
+        histogram = stats.score_histogram or empty_histogram()
+        if old_score is not None:
+            histogram[str(old_score)] = max(histogram.get(str(old_score), 0) - 1, 0)
+        if new_score is not None:
+            histogram[str(new_score)] = histogram.get(str(new_score), 0) + 1
+        stats.score_histogram = histogram
+        stats.rating_sum += (new_score or 0) - (old_score or 0)
+        count_delta = (new_score is not None) - (old_score is not None)
+        update_fields = ['score_histogram', 'rating_sum']
+
+        if count_delta:
+            stats.rating_count += count_delta
+            genre_counts = stats.genre_counts
+            for genre_id in Anime.genres.through.objects.filter(anime_id=anime_id).values_list('genre_id', flat=True):
+                count = genre_counts.get(genre_id, 0) + count_delta
+                if count > 0:
+                    genre_counts[genre_id] = count
+                else:
+                    genre_counts.pop(genre_id, None)
+            update_fields += ['rating_count', 'genre_counts']
+        stats.save(update_fields=update_fields)
+
+
+_genre_names = {'version': None, 'names': {}}
+_genre_names_lock = threading.Lock()
+
+
+def genre_names():
+    """Genre id -> name, reloaded when the GENRES version changes"""
+    version = get_version(GENRES)
+    if _genre_names['version'] != version:
+        with _genre_names_lock:
+            if _genre_names['version'] != version:
+                _genre_names['names'] = dict(Genre.objects.values_list('id', 'name'))
+                _genre_names['version'] = version
+    return _genre_names['names']
+
+
+def top_genres(stats, k=TOP_GENRES):
+    names = genre_names()
+    top = heapq.nlargest(
+        k, ((count, genre_id) for genre_id, count in stats.genre_counts.items() if genre_id in names)
+    )
+    return [{'id': genre_id, 'name': names[genre_id], 'count': count} for count, genre_id in top]
+
+
+def summary(stats):
+    """The stats endpoint's payload"""
+    return {
+        'rating_count': stats.rating_count,
+        'comment_count': stats.comment_count,
+        'watchlist_count': stats.watchlist_count,
+        'average_rating': round(stats.rating_sum / stats.rating_count, 2) if stats.rating_count else 0,
+        'score_histogram': {**empty_histogram(), **stats.score_histogram},
+        'top_genres': top_genres(stats),
+    }
+
+
+def rebuild_all(batch_size=2000):
+    """Recompute every user's row from the tables with grouped queries, replacing existing rows"""
+    rows = {}
+
+    def row(user_id):
+        stats = rows.get(user_id)
+        if stats is None:
+            stats = rows[user_id] = UserActivityStats(
+                user_id=user_id, score_histogram=empty_histogram(), genre_counts={}
+            )
+        return stats
+
+    ratings = Rating.objects.values_list('user_id', 'score').annotate(count=Count('id')).order_by()
+    for user_id, score, count in ratings.iterator(chunk_size=10000):
+        stats = row(user_id)
+        stats.score_histogram[str(score)] = count
+        stats.rating_count += count
+        stats.rating_sum += score * count
+    genres = Rating.objects.values_list('user_id', 'anime__genres').annotate(count=Count('id')).order_by()
+    for user_id, genre_id, count in genres.iterator(chunk_size=10000):
+        if genre_id is not None:
+            row(user_id).genre_counts[genre_id] = count
+    comments = Comment.objects.values_list('user_id').annotate(count=Count('id')).order_by()
+    for user_id, count in comments.iterator(chunk_size=10000):
+        row(user_id).comment_count = count
+    watchlist = Watchlist.objects.values_list('user_id').annotate(count=Count('id')).order_by()
+    for user_id, count in watchlist.iterator(chunk_size=10000):
+        row(user_id).watchlist_count = count
+
+    with transaction.atomic():
+        UserActivityStats.objects.all().delete()
+        UserActivityStats.objects.bulk_create(rows.values(), batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from users.activity import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute every UserActivityStats row from the Rating, Comment and Watchlist tables'
+
+    def handle(self, *args, **options):
+        count = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Activity stats rebuilt for {count} users'))
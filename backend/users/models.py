@@ -13,6 +13,10 @@ class CustomUser(AbstractUser):
     class Meta:
         verbose_name = _("user")
         verbose_name_plural = _("users")
+        indexes = [
+            # Keyset ordering of the admin user list
+            models.Index(fields=['-date_joined', '-id'], name='user_joined_idx'),
+        ]
     
     def __str__(self):
         return self.username
@@ -31,6 +35,27 @@ class Watchlist(models.Model):
     
     class Meta:
         unique_together = ('user', 'anime')
+        indexes = [
+            models.Index(fields=['user', '-date_added'], name='watchlist_user_recent_idx'),
+        ]
         
     def __str__(self):
         return f"{self.user.username} - {self.anime.title}"
+
+class UserActivityStats(models.Model):
+    """Per-user activity counters for the profile page, maintained by users.activity"""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='activity_stats')
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    watchlist_count = models.IntegerField(default=0)
+    # {"1": ratings with score 1, ..., "10": ...}
+    score_histogram = models.JSONField(default=dict)
+    # {genre id: ratings of anime in that genre}
+    genre_counts = models.JSONField(default=dict)
+    
+    class Meta:
+        verbose_name_plural = 'user activity stats'
+    
+    def __str__(self):
+        return f"{self.user_id}'s activity"
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from anime.models import Comment
+from anime.signals import bump_on_commit, in_bulk_comment_delete
+from anime.versions import user_watchlist_version
+
+from . import activity
+from .models import Watchlist
+
+
+@receiver(post_save, sender=Watchlist)
+@receiver(post_delete, sender=Watchlist)
+def watchlist_changed(sender, instance, **kwargs):
+    bump_on_commit(user_watchlist_version(instance.user_id))
+
+
+@receiver(post_save, sender=Watchlist)
+def watchlist_added(sender, instance, created, **kwargs):
+    if created:
+        activity.adjust(instance.user_id, 'watchlist_count', 1, created=True)
+
+
+@receiver(post_delete, sender=Watchlist)
+def watchlist_removed(sender, instance, **kwargs):
+    activity.adjust(instance.user_id, 'watchlist_count', -1, created=False)
+
+
+@receiver(post_save, sender=Comment)
+def comment_added(sender, instance, created, **kwargs):
+    if created:
+        activity.adjust(instance.user_id, 'comment_count', 1, created=True)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_removed(sender, instance, **kwargs):
+    if in_bulk_comment_delete():
+        return
+    activity.adjust(instance.user_id, 'comment_count', -1, created=False)
@@ -2,9 +2,11 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .views import (
-    RegisterView, UserProfileView, 
+    RegisterView, UserProfileView, UserStatsView,
     WatchlistView, WatchlistAddView, 
-    WatchlistRemoveView, WatchlistCheckView
+    WatchlistRemoveView, WatchlistCheckView, WatchlistBatchCheckView,
+    AdminUserManagementView, AdminUserExportView, AdminContentModerationView,
+    ReportCommentView
 )
 
 urlpatterns = [
@@ -15,10 +17,20 @@ urlpatterns = [
     
     # User Profile URLs
     path('profile/', UserProfileView.as_view(), name='user_profile'),
+    path('user-stats/', UserStatsView.as_view(), name='user_stats'),
     
     # Watchlist URLs
     path('watchlist/', WatchlistView.as_view(), name='watchlist'),
     path('watchlist/add/', WatchlistAddView.as_view(), name='watchlist_add'),
     path('watchlist/remove/<int:anime_id>/', WatchlistRemoveView.as_view(), name='watchlist_remove'),
     path('watchlist/check/<int:anime_id>/', WatchlistCheckView.as_view(), name='watchlist_check'),
+    path('watchlist/check/', WatchlistBatchCheckView.as_view(), name='watchlist_check_batch'),
+    
+    # Comment reports
+    path('comments/report/<int:comment_id>/', ReportCommentView.as_view(), name='comment_report'),
+    
+    # Admin URLs
+    path('admin/users/', AdminUserManagementView.as_view(), name='admin_users'),
+    path('admin/users/export/', AdminUserExportView.as_view(), name='admin_users_export'),
+    path('admin/moderation/', AdminContentModerationView.as_view(), name='admin_moderation'),
 ]
@@ -1,14 +1,26 @@
 
+import datetime
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import api_view, permission_classes
 
+from django.conf import settings
 from .serializers import UserRegistrationSerializer, UserProfileSerializer, WatchlistSerializer
 from .models import UserProfile, Watchlist
-from anime.models import Anime, Comment, Rating
+from . import activity, watchlist_cache
+from anime import moderation
+from anime.models import Anime, Comment
+from anime.pagination import ReportQueuePagination, UserCursorPagination
+from anime.serializers import CommentSerializer, requested_ids
 
 User = get_user_model()
 
@@ -67,7 +79,9 @@ class WatchlistView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        watchlist = Watchlist.objects.filter(user=request.user)
+        watchlist = Watchlist.objects.filter(user=request.user).select_related('anime').prefetch_related(
+            'anime__genres'
+        ).order_by('-date_added')
         serializer = WatchlistSerializer(watchlist, many=True)
         return Response(serializer.data)
 
@@ -105,28 +119,90 @@ class WatchlistCheckView(APIView):
         is_in_watchlist = Watchlist.objects.filter(user=request.user, anime_id=anime_id).exists()
         return Response({'in_watchlist': is_in_watchlist})
 
+class WatchlistBatchCheckView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """Watchlist membership for every anime in ?ids=1,2,3"""
+        try:
+            anime_ids = requested_ids(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if getattr(settings, 'WATCHLIST_MEMBERSHIP_CACHE', False):
+            bits = watchlist_cache.membership(request.user.pk)
+            in_watchlist = {pk: watchlist_cache.contains(bits, pk) for pk in anime_ids}
+        else:
+            saved = set(
+                Watchlist.objects.filter(user=request.user, anime_id__in=anime_ids)
+                .values_list('anime_id', flat=True)
+            )
+            in_watchlist = {pk: pk in saved for pk in anime_ids}
+        return Response({'in_watchlist': in_watchlist})
+
 # Admin moderation views
 class IsAdminUser(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_staff
 
+ADMIN_USER_FIELDS = ('id', 'username', 'email', 'is_active', 'is_staff', 'date_joined')
+EXPORT_CHUNK_SIZE = 2000
+
+# Sorts after every character, so [prefix, prefix + PREFIX_END) is a prefix match
+PREFIX_END = '\U0010ffff'
+
+def parse_flag(value):
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise ValueError(f'Expected true or false, got "{value}"')
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Expected an ISO 8601 date or datetime, got "{value}"')
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+def filter_users(queryset, params):
+    """
+    Apply the admin list filters in `params`: is_active, is_staff, username
+    and email prefixes, and a joined_after/joined_before range. Prefixes are
+    range conditions so they can use the unique indexes. Raises ValueError.
+    """
+    for flag in ('is_active', 'is_staff'):
+        if params.get(flag):
+            queryset = queryset.filter(**{flag: parse_flag(params[flag])})
+    for field in ('username', 'email'):
+        prefix = params.get(field)
+        if prefix:
+            queryset = queryset.filter(**{f'{field}__gte': prefix, f'{field}__lt': prefix + PREFIX_END})
+    if params.get('joined_after'):
+        queryset = queryset.filter(date_joined__gte=parse_moment(params['joined_after']))
+    if params.get('joined_before'):
+        queryset = queryset.filter(date_joined__lt=parse_moment(params['joined_before']))
+    return queryset
+
 class AdminUserManagementView(APIView):
     permission_classes = [IsAdminUser]
     
     def get(self, request):
-        """List all users for admin"""
-        users = User.objects.all()
+        """List users for admin, cursor-paginated and filtered"""
+        try:
+            users = filter_users(User.objects.values(*ADMIN_USER_FIELDS), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        paginator = UserCursorPagination()
+        page = paginator.paginate_queryset(users, request, view=self)
         return Response({
-            'users': [
-                {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'is_active': user.is_active,
-                    'is_staff': user.is_staff,
-                    'date_joined': user.date_joined
-                } for user in users
-            ]
+            'next': paginator.get_next_link(),
+            'users': page,
         })
     
     def post(self, request):
@@ -156,37 +232,74 @@ class AdminUserManagementView(APIView):
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-class AdminContentModerationView(APIView):
+class AdminUserExportView(APIView):
     permission_classes = [IsAdminUser]
     
     def get(self, request):
-        """List reported or flagged content"""
-        # Get comments that might need moderation (example criteria)
-        reported_comments = Comment.objects.filter(reported=True) if hasattr(Comment, 'reported') else []
+        """Every user matching the list filters, one JSON object per line"""
+        try:
+            users = filter_users(User.objects.values(*ADMIN_USER_FIELDS), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
+        # The iterator fetches rows in chunks as the client reads, so memory
+        # does not grow with the number of users
+        rows = users.order_by('id').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        lines = (json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+        response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="users.ndjson"'
+        return response
+
+def requested_comment_ids(data):
+    """Distinct comment ids from `comment_ids` (or a single `comment_id`); ValueError if malformed"""
+    values = data.get('comment_ids')
+    if values is None and data.get('comment_id') is not None:
+        values = [data.get('comment_id')]
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values)) if isinstance(values, list) else None
+    except (TypeError, ValueError):
+        ids = None
+    if not ids:
+        raise ValueError('comment_ids must be a list of comment ids')
+    if len(ids) > moderation.MAX_BULK_IDS:
+        raise ValueError(f'At most {moderation.MAX_BULK_IDS} comments can be moderated per request')
+    return ids
+
+class AdminContentModerationView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        """Reported comments with open reports, most reported first, cursor-paginated"""
+        paginator = ReportQueuePagination()
+        page = paginator.paginate_queryset(moderation.queue(), request, view=self)
+        comments = Comment.objects.select_related('user').in_bulk([entry['comment'] for entry in page])
         return Response({
-            'reported_comments': CommentSerializer(reported_comments, many=True).data
+            'next': paginator.get_next_link(),
+            'reported_comments': [
+                {
+                    **CommentSerializer(comments[entry['comment']]).data,
+                    'report_count': entry['report_count'],
+                    'first_reported_at': entry['first_reported_at'],
+                } for entry in page
+            ],
         })
     
     def post(self, request):
-        """Moderate content - remove comment or clear report flag"""
-        comment_id = request.data.get('comment_id')
-        action = request.data.get('action')
-        
+        """Approve or remove up to MAX_BULK_IDS comments at once"""
         try:
-            comment = Comment.objects.get(id=comment_id)
-            if action == 'remove':
-                comment.delete()
-                return Response({'message': 'Comment removed'})
-            elif action == 'approve':
-                if hasattr(Comment, 'reported'):
-                    comment.reported = False
-                    comment.save()
-                return Response({'message': 'Comment approved'})
-            else:
-                return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
-        except Comment.DoesNotExist:
-            return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
+            comment_ids = requested_comment_ids(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        action = request.data.get('action')
+        if action == 'remove':
+            count = moderation.remove(comment_ids)
+            return Response({'message': f'{count} comments removed', 'count': count})
+        elif action == 'approve':
+            count = moderation.approve(comment_ids)
+            return Response({'message': f'{count} reports resolved', 'count': count})
+        else:
+            return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
 
 class ReportCommentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -195,41 +308,18 @@ class ReportCommentView(APIView):
         """Allow users to report inappropriate comments"""
         try:
             comment = Comment.objects.get(id=comment_id)
-            
-            # If the model has a reported field, use it
-            if hasattr(Comment, 'reported'):
-                comment.reported = True
-                comment.save()
-            
-            # In a real implementation, you might want to create a separate Report model
-            # to track who reported what and why
-            
-            return Response({'message': 'Comment reported to moderators'})
         except Comment.DoesNotExist:
             return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        reason = str(request.data.get('reason', ''))[:255]
+        report, created = moderation.report(comment, request.user, reason)
+        if not created:
+            return Response({'message': 'Comment already reported'})
+        return Response({'message': 'Comment reported to moderators'}, status=status.HTTP_201_CREATED)
 
 class UserStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        """Get statistics for the current user"""
-        user = request.user
-        
-        # Count ratings
-        rating_count = Rating.objects.filter(user=user).count()
-        
-        # Count comments
-        comment_count = Comment.objects.filter(user=user).count()
-        
-        # Get watchlist size
-        watchlist_count = Watchlist.objects.filter(user=user).count()
-        
-        # Get average rating given by user
-        avg_rating = Rating.objects.filter(user=user).aggregate(Avg('score'))
-        
-        return Response({
-            'rating_count': rating_count,
-            'comment_count': comment_count,
-            'watchlist_count': watchlist_count,
-            'average_rating': avg_rating['score__avg'] or 0
-        })
+        """Activity statistics for the current user, from their counters row"""
+        return Response(activity.summary(activity.get_stats(request.user.pk)))
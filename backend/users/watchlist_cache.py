@@ -0,0 +1,62 @@
+"""
+In-process watchlist membership bitsets.
+
+A card grid asks whether each of its anime is in the user's watchlist. The
+answer for every anime a user has saved fits in one Python int with bit
+`anime_id` set, built from a single query and reused until the user's
+watchlist version (bumped by users.signals) changes or it is older than
+WATCHLIST_MEMBERSHIP_TTL seconds. Only the most recently used users are kept.
+
+Versions live in the default cache, so a write handled by another worker is
+only seen here when that cache is shared (redis or file). With the local
+memory cache each process has its own versions and the TTL alone bounds how
+stale a bitset can be; the cache is off unless WATCHLIST_MEMBERSHIP_CACHE=1.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from anime.versions import get_version, user_watchlist_version
+
+from .models import Watchlist
+
+MAX_USERS = 10000
+
+DEFAULT_TTL = 60
+
+_bitsets = OrderedDict()
+_lock = threading.Lock()
+
+
+def membership(user_id):
+    """Bitset of the anime ids on `user_id`'s watchlist"""
+    version = get_version(user_watchlist_version(user_id))
+    now = time.monotonic()
+    ttl = getattr(settings, 'WATCHLIST_MEMBERSHIP_TTL', DEFAULT_TTL)
+    with _lock:
+        entry = _bitsets.get(user_id)
+        if entry is not None and entry[0] == version and now - entry[2] < ttl:
+            _bitsets.move_to_end(user_id)
+            return entry[1]
+
+    bits = 0
+    for anime_id in Watchlist.objects.filter(user_id=user_id).values_list('anime_id', flat=True).iterator():
+        bits |= 1 << anime_id
+
+    with _lock:
+        _bitsets[user_id] = (version, bits, now)
+        _bitsets.move_to_end(user_id)
+        while len(_bitsets) > MAX_USERS:
+            _bitsets.popitem(last=False)
+    return bits
+
+
+def contains(bits, anime_id):
+    return anime_id >= 0 and bool(bits >> anime_id & 1)
+
+
+def clear():
+    with _lock:
+        _bitsets.clear()
@@ -5,7 +5,7 @@ import { Avatar, AvatarFallback, AvatarImage } from '@/components/ui/avatar';
 import { Button } from '@/components/ui/button';
 import { Textarea } from '@/components/ui/textarea';
 import { fetchAnimeComments, postComment } from '@/services/api';
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { toast } from '@/hooks/use-toast';
 import { useAuth } from '@/context/AuthContext';
 import { formatDistanceToNow } from 'date-fns';
@@ -19,10 +19,14 @@ const CommentSection: React.FC<CommentSectionProps> = ({ animeId }) => {
   const { isAuthenticated } = useAuth();
   const queryClient = useQueryClient();
 
-  const { data: comments = [], isLoading } = useQuery({
+  // Newest comments first, older pages on demand
+  const { data, isLoading, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ['comments', animeId],
-    queryFn: () => fetchAnimeComments(animeId)
+    queryFn: ({ pageParam }) => fetchAnimeComments(animeId, pageParam),
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next,
   });
+  const comments: Comment[] = data?.pages.flatMap(page => page.results) ?? [];
 
   const mutation = useMutation({
     mutationFn: (content: string) => postComment(animeId, content),
@@ -114,6 +118,17 @@ const CommentSection: React.FC<CommentSectionProps> = ({ animeId }) => {
             </div>
           ))
         )}
+        {hasNextPage && (
+          <div className="flex justify-center">
+            <Button
+              variant="outline"
+              onClick={() => fetchNextPage()}
+              disabled={isFetchingNextPage}
+            >
+              {isFetchingNextPage ? 'Loading...' : 'Load older comments'}
+            </Button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -0,0 +1,201 @@
+import React, { useState } from 'react';
+import Header from '@/components/Header';
+import Footer from '@/components/Footer';
+import { Button } from '@/components/ui/button';
+import { Input } from '@/components/ui/input';
+import { Badge } from '@/components/ui/badge';
+import {
+  Select,
+  SelectContent,
+  SelectItem,
+  SelectTrigger,
+  SelectValue,
+} from '@/components/ui/select';
+import {
+  Table,
+  TableBody,
+  TableCell,
+  TableHead,
+  TableHeader,
+  TableRow,
+} from '@/components/ui/table';
+import { useInfiniteQuery, useMutation, useQuery, useQueryClient } from '@tanstack/react-query';
+import { fetchAllUsers, isAdmin, manageUser } from '@/services/api';
+import { AdminUserFilters } from '@/services/types';
+import { toast } from '@/hooks/use-toast';
+
+type FlagFilter = 'all' | 'true' | 'false';
+
+const toFlag = (value: FlagFilter): boolean | undefined =>
+  value === 'all' ? undefined : value === 'true';
+
+const AdminUsersPage = () => {
+  const queryClient = useQueryClient();
+  const [username, setUsername] = useState('');
+  const [email, setEmail] = useState('');
+  const [active, setActive] = useState<FlagFilter>('all');
+  const [staff, setStaff] = useState<FlagFilter>('all');
+
+  const filters: AdminUserFilters = {
+    username: username.trim() || undefined,
+    email: email.trim() || undefined,
+    is_active: toFlag(active),
+    is_staff: toFlag(staff),
+  };
+
+  const { data: allowed, isLoading: checkingAccess } = useQuery({
+    queryKey: ['isAdmin'],
+    queryFn: isAdmin,
+  });
+
+  // A page of users at a time; changing a filter starts again from the first page
+  const { data, isLoading, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
+    queryKey: ['adminUsers', filters],
+    queryFn: ({ pageParam }) => fetchAllUsers(filters, pageParam),
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next,
+    enabled: !!allowed,
+  });
+  const users = data?.pages.flatMap(page => page.users) ?? [];
+
+  const manageMutation = useMutation({
+    mutationFn: ({ userId, action }: { userId: number; action: 'activate' | 'deactivate' }) =>
+      manageUser(userId, action),
+    onSuccess: () => {
+      queryClient.invalidateQueries({ queryKey: ['adminUsers'] });
+    },
+    onError: () => {
+      toast({
+        title: "Error",
+        description: "Failed to update the user",
+        variant: "destructive"
+      });
+    }
+  });
+
+  return (
+    <div className="flex flex-col min-h-screen">
+      <Header />
+
+      <main className="flex-grow px-6 py-8 max-w-7xl mx-auto w-full">
+        <div className="mb-8">
+          <h1 className="text-4xl font-bold mb-4">Users</h1>
+          <p className="text-muted-foreground text-lg">
+            Newest members first. Filter by username or email prefix and account status.
+          </p>
+        </div>
+
+        {checkingAccess ? (
+          <div className="flex justify-center items-center py-16">
+            <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-anime-purple"></div>
+          </div>
+        ) : !allowed ? (
+          <div className="text-center py-16 bg-muted/30 rounded-lg">
+            <p className="text-muted-foreground">Only staff accounts can manage users.</p>
+          </div>
+        ) : (
+          <>
+            <div className="grid grid-cols-1 md:grid-cols-4 gap-4 mb-6">
+              <Input
+                placeholder="Username starts with..."
+                value={username}
+                onChange={(e) => setUsername(e.target.value)}
+              />
+              <Input
+                placeholder="Email starts with..."
+                value={email}
+                onChange={(e) => setEmail(e.target.value)}
+              />
+              <Select value={active} onValueChange={(value) => setActive(value as FlagFilter)}>
+                <SelectTrigger>
+                  <SelectValue placeholder="Status" />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="all">Any status</SelectItem>
+                  <SelectItem value="true">Active</SelectItem>
+                  <SelectItem value="false">Inactive</SelectItem>
+                </SelectContent>
+              </Select>
+              <Select value={staff} onValueChange={(value) => setStaff(value as FlagFilter)}>
+                <SelectTrigger>
+                  <SelectValue placeholder="Role" />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="all">Any role</SelectItem>
+                  <SelectItem value="true">Staff</SelectItem>
+                  <SelectItem value="false">Members</SelectItem>
+                </SelectContent>
+              </Select>
+            </div>
+
+            {isLoading ? (
+              <div className="flex justify-center items-center py-16">
+                <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-anime-purple"></div>
+              </div>
+            ) : users.length === 0 ? (
+              <div className="text-center py-12 bg-muted/20 rounded-md">
+                <p className="text-muted-foreground">No users match these filters.</p>
+              </div>
+            ) : (
+              <Table>
+                <TableHeader>
+                  <TableRow>
+                    <TableHead>Username</TableHead>
+                    <TableHead>Email</TableHead>
+                    <TableHead>Joined</TableHead>
+                    <TableHead>Status</TableHead>
+                    <TableHead className="text-right">Actions</TableHead>
+                  </TableRow>
+                </TableHeader>
+                <TableBody>
+                  {users.map((user) => (
+                    <TableRow key={user.id}>
+                      <TableCell className="font-medium">{user.username}</TableCell>
+                      <TableCell>{user.email}</TableCell>
+                      <TableCell>{new Date(user.date_joined).toLocaleDateString()}</TableCell>
+                      <TableCell className="space-x-2">
+                        <Badge variant={user.is_active ? 'default' : 'outline'}>
+                          {user.is_active ? 'Active' : 'Inactive'}
+                        </Badge>
+                        {user.is_staff && <Badge className="bg-anime-purple">Staff</Badge>}
+                      </TableCell>
+                      <TableCell className="text-right">
+                        <Button
+                          variant="outline"
+                          size="sm"
+                          disabled={manageMutation.isPending}
+                          onClick={() => manageMutation.mutate({
+                            userId: user.id,
+                            action: user.is_active ? 'deactivate' : 'activate',
+                          })}
+                        >
+                          {user.is_active ? 'Deactivate' : 'Activate'}
+                        </Button>
+                      </TableCell>
+                    </TableRow>
+                  ))}
+                </TableBody>
+              </Table>
+            )}
+
+            {hasNextPage && (
+              <div className="flex justify-center mt-8">
+                <Button
+                  variant="outline"
+                  onClick={() => fetchNextPage()}
+                  disabled={isFetchingNextPage}
+                >
+                  {isFetchingNextPage ? 'Loading...' : 'Load more'}
+                </Button>
+              </div>
+            )}
+          </>
+        )}
+      </main>
+
+      <Footer />
+    </div>
+  );
+};
+
+export default AdminUsersPage;
@@ -2,7 +2,7 @@
 import React from 'react';
 import { useParams } from 'react-router-dom';
 import { useQuery } from '@tanstack/react-query';
-import { fetchAnimeById, getUserRating, rateAnime } from '@/services/api';
+import { fetchAnimeById, fetchRatingSummary, getUserRating, rateAnime } from '@/services/api';
 import Header from '@/components/Header';
 import Footer from '@/components/Footer';
 import RecommendationWidget from '@/components/RecommendationWidget';
@@ -28,6 +28,13 @@ const AnimeDetailPage = () => {
     enabled: !!animeId,
   });
 
+  // Scores come from the anime's counters, not its list of ratings
+  const { data: ratingSummary } = useQuery({
+    queryKey: ['ratingSummary', animeId],
+    queryFn: () => fetchRatingSummary(animeId),
+    enabled: !!animeId,
+  });
+
   const { data: userRating } = useQuery({
     queryKey: ['userRating', animeId],
     queryFn: () => getUserRating(animeId),
@@ -38,6 +45,7 @@ const AnimeDetailPage = () => {
     mutationFn: (score: number) => rateAnime(animeId, score),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['userRating', animeId] });
+      queryClient.invalidateQueries({ queryKey: ['ratingSummary', animeId] });
       toast({
         title: "Rating Submitted",
         description: "Your rating has been saved",
@@ -76,6 +84,8 @@ const AnimeDetailPage = () => {
     );
   }
 
+  const score = ratingSummary?.mean ?? anime.rating;
+
   return (
     <div className="flex flex-col min-h-screen">
       <Header />
@@ -124,8 +134,13 @@ const AnimeDetailPage = () => {
               
               <div className="flex items-center gap-4 mb-4">
                 <div className="flex items-center">
-                  <RatingStars initialRating={anime.rating / 2} readOnly size="lg" />
-                  <span className="ml-2 text-lg font-medium">{anime.rating.toFixed(1)}</span>
+                  <RatingStars initialRating={score / 2} readOnly size="lg" />
+                  <span className="ml-2 text-lg font-medium">{score.toFixed(1)}</span>
+                  {ratingSummary && (
+                    <span className="ml-2 text-sm text-muted-foreground">
+                      ({ratingSummary.rating_count} {ratingSummary.rating_count === 1 ? 'rating' : 'ratings'})
+                    </span>
+                  )}
                 </div>
                 
                 {isAuthenticated && (
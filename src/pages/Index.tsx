@@ -7,8 +7,9 @@ import AnimeGrid from '@/components/AnimeGrid';
 import TrendingSection from '@/components/TrendingSection';
 import { Anime } from '@/services/animeData';
 import { fetchAnimeList, searchAnimeByQuery } from '@/services/api';
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery, useQuery } from '@tanstack/react-query';
 import { Skeleton } from '@/components/ui/skeleton';
+import { Button } from '@/components/ui/button';
 import { toast } from "sonner";
 
 const Index = () => {
@@ -17,24 +18,48 @@ const Index = () => {
   const [retryCount, setRetryCount] = useState(0);
   const [showAllAnime, setShowAllAnime] = useState(true);
 
-  // Fetch anime list with fallback to mock data
-  const { data: animeList = [], isLoading, error, refetch } = useQuery({
+  // Fetch the catalogue a page at a time, with fallback to mock data
+  const {
+    data: animePages,
+    isLoading,
+    error,
+    refetch,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
     queryKey: ['animeList', retryCount],
-    queryFn: async () => {
-      console.log('Fetching anime list...');
+    queryFn: async ({ pageParam }) => {
+      console.log('Fetching anime list page...');
       try {
-        const result = await fetchAnimeList();
-        console.log('Anime list fetch successful:', result.length, 'items');
-        return result;
+        const page = await fetchAnimeList({}, pageParam);
+        console.log('Anime list page fetch successful:', page.results.length, 'items');
+        return page;
       } catch (error) {
         console.error("Failed to fetch anime list:", error);
         toast.error("Failed to load anime data");
         throw error;
       }
     },
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next,
     retry: 1, // Only retry once since we have mock fallback
     staleTime: 5 * 60 * 1000, // 5 minutes
   });
+  const animeList = animePages?.pages.flatMap(page => page.results) ?? [];
+
+  // The top rated and latest rows only need their first five titles
+  const { data: topRatedAnime = [] } = useQuery({
+    queryKey: ['animeList', 'top-rated', retryCount],
+    queryFn: async () => (await fetchAnimeList({ ordering: '-rating', pageSize: 5 })).results,
+    staleTime: 5 * 60 * 1000,
+  });
+
+  const { data: latestAnime = [] } = useQuery({
+    queryKey: ['animeList', 'latest', retryCount],
+    queryFn: async () => (await fetchAnimeList({ ordering: '-year', pageSize: 5 })).results,
+    staleTime: 5 * 60 * 1000,
+  });
 
   // Add effect to notify about using mock data
   useEffect(() => {
@@ -44,7 +69,7 @@ const Index = () => {
         toast.info("Using mock data for demonstration");
       }
     }
-  }, [animeList, isLoading, error]);
+  }, [animePages, isLoading, error]);
 
   const handleSearch = async (query: string) => {
     if (query.length > 0) {
@@ -71,15 +96,6 @@ const Index = () => {
     toast.info("Retrying to load anime data...");
   };
 
-  // Ensure top rated and latest anime are only computed when animeList is available
-  const topRatedAnime = animeList && animeList.length > 0 
-    ? [...animeList].sort((a, b) => b.rating - a.rating).slice(0, 5)
-    : [];
-
-  const latestAnime = animeList && animeList.length > 0
-    ? [...animeList].sort((a, b) => b.year - a.year).slice(0, 5)
-    : [];
-
   return (
     <div className="flex flex-col min-h-screen">
       <Header onSearch={handleSearch} />
@@ -155,6 +171,17 @@ const Index = () => {
                   animeList={animeList}
                   emptyMessage="No anime available." 
                 />
+                {hasNextPage && (
+                  <div className="flex justify-center mt-8">
+                    <Button
+                      variant="outline"
+                      onClick={() => fetchNextPage()}
+                      disabled={isFetchingNextPage}
+                    >
+                      {isFetchingNextPage ? 'Loading...' : 'Load more'}
+                    </Button>
+                  </div>
+                )}
               </section>
             )}
           </>
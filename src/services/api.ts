@@ -1,5 +1,5 @@
 import axios, { AxiosError } from 'axios';
-import { Anime, Genre, Comment, Rating, CharacterData, UserProfile } from './types';
+import { Anime, Genre, Comment, RatingSummary, CharacterData, UserProfile, AdminUser, AdminUserFilters } from './types';
 import { mockAnimeList, mockTrendingAnime, mockGenres, mockComments, mockWatchlist, mockCharacters, fetchRealAnimeData, searchRealAnime, fetchRealTrendingAnime } from './mockData';
 
 // Toggle this to false to use real API calls instead of mock data for backend features
@@ -76,6 +76,33 @@ const safeApiCall = async <T>(
   }
 };
 
+// One page of a cursor-paginated listing; pass `next` back to load the following page
+export interface Page<T> {
+  results: T[];
+  next: string | null;
+}
+
+// Helper function to read every page of a cursor-paginated endpoint.
+// Only for admin paths that need the whole listing; screens load pages on demand.
+const fetchAllPages = async <T>(url: string, key: string = 'results'): Promise<T[]> => {
+  const rows: T[] = [];
+  let next: string | null = url;
+  while (next) {
+    const response = await api.get<{ next: string | null } & Record<string, unknown>>(next);
+    rows.push(...(response.data[key] as T[]));
+    next = response.data.next;
+  }
+  return rows;
+};
+
+// Helper function to page through a list held in memory (real or mock data)
+// with the same {results, next} shape, using the offset as the cursor
+const localPage = <T>(rows: T[], pageSize: number, cursor: string | null): Page<T> => {
+  const start = cursor ? Number(cursor.replace('local:', '')) : 0;
+  const end = start + pageSize;
+  return { results: rows.slice(start, end), next: end < rows.length ? `local:${end}` : null };
+};
+
 // Authentication APIs
 export const loginUser = async (username: string, password: string) => {
   // Only try API if mock data is disabled
@@ -118,22 +145,42 @@ export const logoutUser = () => {
 };
 
 // Anime APIs
-export const fetchAnimeList = async (): Promise<Anime[]> => {
+export type AnimeOrdering = '-rating' | 'rating' | '-year' | 'year' | '-weighted_score' | 'weighted_score';
+
+export interface AnimeListParams {
+  ordering?: AnimeOrdering;
+  pageSize?: number;
+}
+
+const sortAnime = (animeList: Anime[], ordering: AnimeOrdering = '-rating'): Anime[] => {
+  const field = ordering.replace('-', '') === 'year' ? 'year' : 'rating';
+  const direction = ordering.startsWith('-') ? -1 : 1;
+  return [...animeList].sort((a, b) => direction * (a[field] - b[field]));
+};
+
+// One page of the catalogue; pass the returned `next` as `cursor` for the following page
+export const fetchAnimeList = async (
+  params: AnimeListParams = {},
+  cursor: string | null = null
+): Promise<Page<Anime>> => {
+  const pageSize = params.pageSize ?? 24;
   if (USE_REAL_ANIME_DATA) {
     try {
-      return await fetchRealAnimeData();
+      return localPage(sortAnime(await fetchRealAnimeData(), params.ordering), pageSize, cursor);
     } catch (error) {
       console.error('Error fetching anime list:', error);
-      return mockAnimeList;
+      return localPage(mockAnimeList, pageSize, cursor);
     }
   }
   
   return safeApiCall(
     async () => {
-      const response = await api.get('/anime/');
+      const response = cursor
+        ? await api.get<Page<Anime>>(cursor)
+        : await api.get<Page<Anime>>('/anime/', { params: { ordering: params.ordering, page_size: pageSize } });
       return response.data;
     },
-    mockAnimeList,
+    localPage(mockAnimeList, pageSize, cursor),
     'Error fetching anime list:'
   );
 };
@@ -387,9 +434,16 @@ export const isInWatchlist = async (animeId: number): Promise<boolean> => {
 };
 
 // Ratings APIs
-export const fetchAnimeRatings = async (animeId: number): Promise<Rating[]> => {
-  const response = await api.get(`/anime/${animeId}/ratings/`);
-  return response.data;
+// Score statistics from the anime's counters, instead of its raw ratings
+export const fetchRatingSummary = async (animeId: number): Promise<RatingSummary | null> => {
+  return safeApiCall(
+    async () => {
+      const response = await api.get<RatingSummary>(`/anime/${animeId}/rating-summary/`);
+      return response.data;
+    },
+    null,
+    `Error fetching the rating summary of anime ${animeId}:`
+  );
 };
 
 export const rateAnime = async (animeId: number, score: number): Promise<void> => {
@@ -402,8 +456,9 @@ export const getUserRating = async (animeId: number): Promise<number | null> =>
 };
 
 // Comments/Reviews APIs
-export const fetchAnimeComments = async (animeId: number): Promise<Comment[]> => {
-  const response = await api.get(`/anime/${animeId}/comments/`);
+// One page of comments, newest first; pass the returned `next` as `cursor` for older ones
+export const fetchAnimeComments = async (animeId: number, cursor: string | null = null): Promise<Page<Comment>> => {
+  const response = await api.get<Page<Comment>>(cursor ?? `/anime/${animeId}/comments/`);
   return response.data;
 };
 
@@ -452,9 +507,20 @@ export const isAdmin = async (): Promise<boolean> => {
   }
 };
 
-export const fetchAllUsers = async () => {
-  const response = await api.get('/auth/admin/users/');
-  return response.data.users;
+// One page of users matching `filters`; pass the returned `next` as `cursor` for the following page
+export const fetchAllUsers = async (
+  filters: AdminUserFilters = {},
+  cursor: string | null = null
+): Promise<{ users: AdminUser[]; next: string | null }> => {
+  const params = Object.fromEntries(
+    Object.entries(filters)
+      .filter(([, value]) => value !== undefined && value !== '')
+      .map(([key, value]) => [key, String(value)])
+  );
+  const response = cursor
+    ? await api.get(cursor)
+    : await api.get('/auth/admin/users/', { params });
+  return { users: response.data.users, next: response.data.next };
 };
 
 export const manageUser = async (userId: number, action: 'activate' | 'deactivate' | 'make_admin' | 'remove_admin') => {
@@ -463,8 +529,7 @@ export const manageUser = async (userId: number, action: 'activate' | 'deactivat
 };
 
 export const fetchReportedContent = async () => {
-  const response = await api.get('/auth/admin/moderation/');
-  return response.data;
+  return fetchAllPages('/auth/admin/moderation/', 'reported_comments');
 };
 
 export const moderateContent = async (commentId: number, action: 'remove' | 'approve') => {
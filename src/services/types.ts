@@ -35,6 +35,37 @@ export interface Rating {
   created_at: string;
 }
 
+// Score statistics of one anime, from /anime/<id>/rating-summary/
+export interface RatingSummary {
+  anime_id: number;
+  rating_count: number;
+  mean: number | null;
+  median: number | null;
+  weighted_score: number;
+  histogram: Record<string, number>;
+}
+
+export interface AdminUser {
+  id: number;
+  username: string;
+  email: string;
+  is_active: boolean;
+  is_staff: boolean;
+  date_joined: string;
+}
+
+// Filters of the admin user list; usernames and emails match by prefix
+export interface AdminUserFilters {
+  is_active?: boolean;
+  is_staff?: boolean;
+  username?: string;
+  email?: string;
+  joined_after?: string;
+  joined_before?: string;
+  ordering?: '-date_joined' | 'date_joined' | 'username';
+  page_size?: number;
+}
+
 export interface AuthState {
   isAuthenticated: boolean;
   user: UserProfile | null;